@@ -18,23 +18,69 @@ Usage:
     python check_sources.py --codegen                # Print Swift/Python patches
     python check_sources.py --codegen --apply        # Apply patches in-place
     python check_sources.py --speed-test             # Benchmark alternative mirrors
+    python check_sources.py --full-probe             # Probe every year, not just new ones
     python check_sources.py --verbose                # Show HTTP/XML details
 
 Dependencies: aiohttp (pip install aiohttp)
+Optional:     lxml (faster GetCapabilities parsing), brotli (br responses),
+              aiodns (parallel DNS lookups against several public resolvers),
+              google-re2 (linear-time layer_regex matching),
+              orjson (faster JSON for the registry, --json output and FAO API)
 """
 
 import asyncio
 import aiohttp
 import argparse
+import functools
+import io
 import json
 import os
 import re
+import socket
 import sys
 import time
 import xml.etree.ElementTree as ET
+from collections import namedtuple
+from aiohttp.abc import AbstractResolver
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
+try:
+    from lxml import etree as LET
+except ImportError:
+    LET = None
+
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def _jdump(obj, f):
+        """Write obj as indented JSON to a binary file."""
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+except ImportError:
+    json_loads = json.loads  # also accepts bytes
+
+    def _jdump(obj, f):
+        """Write obj as indented JSON to a binary file."""
+        f.write(json.dumps(obj, indent=2, ensure_ascii=False).encode())
+
+
+def _jload(f):
+    """Parse JSON from a binary file."""
+    return json_loads(f.read())
+
+
+try:
+    import re2 as _re
+except ImportError:
+    _re = re
+
+try:
+    import aiodns  # noqa: F401 — enables aiohttp.AsyncResolver
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 REGISTRY_PATH = os.path.join(SCRIPT_DIR, "source_registry.json")
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -44,7 +90,16 @@ PYTHON_OVERVIEW = os.path.join(SCRIPT_DIR, "generate_overview_tiles.py")
 CURRENT_YEAR = datetime.now().year
 TIMEOUT = aiohttp.ClientTimeout(total=45)
 MAX_HOST_CONCURRENT = 2   # per-host semaphore
-MAX_GLOBAL_CONCURRENT = 6 # global semaphore
+MAX_GLOBAL_CONCURRENT = 6 # global semaphore (initial limit, autotuned)
+GLOBAL_CONCURRENT_RANGE = (2, 12)  # autotune floor/ceiling (ceiling = connector limit)
+AUTOTUNE_INTERVAL = 1.0            # seconds between limit adjustments
+AUTOTUNE_FAST_MS = 1000            # median hold time below which the limit grows
+PROBE_HEAD_BYTES = 8192   # body prefix read when probing for WMS XML
+WMS_CAPABILITIES_MAGIC = (b"<WMS_Capabilities", b"<WMT_MS_Capabilities")
+PROBE_RANGE_HEADER = {"Range": f"bytes=0-{PROBE_HEAD_BYTES - 1}"}
+SESSION_HEADERS = {"User-Agent": "ARCcrop-check/1.0"}
+# Queried in parallel (first answer wins) when aiodns is available
+DNS_NAMESERVERS = ["1.1.1.1", "8.8.8.8", "9.9.9.9", "1.0.0.1", "8.8.4.4"]
 
 # Known alternative WMS mirrors for the same datasets.
 # Each entry: list of {url, layers_template, label} dicts.
@@ -106,39 +161,144 @@ ALTERNATIVE_MIRRORS = {
 
 # ─── Utility ──────────────────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=1024)
 def strip_ns(tag):
     """Remove XML namespace prefix: {http://...}Name -> Name"""
-    return tag.split("}")[-1] if "}" in tag else tag
+    return tag.rpartition("}")[2]
 
 
-def parse_layers_from_xml(xml_text, verbose=False):
-    """Parse WMS GetCapabilities XML, return set of layer names."""
-    layers = set()
+_LAYER_NAME_XPATH = "//*[local-name()='Layer']/*[local-name()='Name']/text()"
+
+
+def parse_layers_from_xml(raw, verbose=False):
+    """Parse WMS GetCapabilities XML bytes, return set of layer names."""
+    if LET is not None:
+        return _parse_layers_lxml(raw, verbose)
+
+    if isinstance(raw, str):
+        raw = raw.encode()
     try:
-        root = ET.fromstring(xml_text)
+        return _iterparse_layers(io.BytesIO(raw))
+    except ET.ParseError as e:
+        if verbose:
+            print(f"  XML parse error: {e}; retrying as latin-1")
+    # Some EU servers send latin-1 without declaring it; as text, the
+    # parser no longer decodes the bytes itself
+    try:
+        return _iterparse_layers(io.StringIO(raw.decode("latin-1")))
     except ET.ParseError as e:
         if verbose:
             print(f"  XML parse error: {e}")
-        return layers
-
-    for elem in root.iter():
-        tag = strip_ns(elem.tag)
-        if tag == "Layer":
-            name_elem = None
-            for child in elem:
-                if strip_ns(child.tag) == "Name":
-                    name_elem = child
-                    break
-            if name_elem is not None and name_elem.text:
-                layers.add(name_elem.text.strip())
+        return set()
+
+
+def _iterparse_layers(source):
+    """Layer names from a capabilities stream; raises ET.ParseError."""
+    layers = set()
+    local = {}  # tag -> tag without namespace
+    # Stream: each Layer is inspected and cleared as soon as it closes,
+    # so memory stays O(depth) rather than O(document).
+    for _, elem in ET.iterparse(source, events=("end",)):
+        tag = local.get(elem.tag)
+        if tag is None:
+            tag = local[elem.tag] = strip_ns(elem.tag)
+        if tag != "Layer":
+            continue
+        for child in elem:
+            child_tag = local.get(child.tag)
+            if child_tag is None:
+                child_tag = local[child.tag] = strip_ns(child.tag)
+            if child_tag == "Name":
+                if child.text and child.text.strip():
+                    layers.add(child.text.strip())
+                break
+        elem.clear()
     return layers
 
 
+def _parse_layers_lxml(raw, verbose=False):
+    """lxml fast path: the Layer/Name walk runs as a single XPath in C."""
+    if isinstance(raw, str):
+        raw = raw.encode()
+    # Strict first; then latin-1 (mislabelled EU servers), and only then
+    # recover=True, which would otherwise turn bad bytes into U+FFFD.
+    for parser in (
+        LET.XMLParser(),
+        LET.XMLParser(encoding="iso-8859-1"),
+        LET.XMLParser(recover=True),
+    ):
+        try:
+            root = LET.fromstring(raw, parser)
+            break
+        except LET.XMLSyntaxError as e:
+            error = e
+    else:
+        if verbose:
+            print(f"  XML parse error: {error}")
+        return set()
+    if root is None:
+        if verbose:
+            print("  XML parse error: empty document")
+        return set()
+    return {s.strip() for s in root.xpath(_LAYER_NAME_XPATH) if s and s.strip()}
+
+
+_regex_cache = {}
+
+def compile_layer_regex(regex):
+    """Compile a source's layer_regex once per run (sources often share one).
+
+    Returns (pattern, joined). When joined is True the pattern is compiled
+    in MULTILINE mode anchored at line starts, so it can scan all layer
+    names joined by newlines in a single call. Patterns that cannot be
+    wrapped that way (e.g. ones opening with a global flag such as (?i))
+    come back bare with joined False, to be matched name by name.
+    """
+    entry = _regex_cache.get(regex)
+    if entry is None:
+        wrapped = f"^(?:{regex})"
+        if _re is not re:
+            try:
+                entry = _re.compile("(?m)" + wrapped), True
+            except Exception:  # re2 rejects backreferences/lookaround
+                pass
+        if entry is None:
+            try:
+                entry = re.compile(wrapped, re.MULTILINE), True
+            except re.error:
+                entry = re.compile(regex), False
+        _regex_cache[regex] = entry
+    return entry
+
+
+def years_from_layers(pattern, joined, layers, joined_layers):
+    """Four-digit years captured by group 1 of pattern across layer names.
+
+    With joined (see compile_layer_regex) the newline-joined joined_layers
+    are matched in one pass; otherwise each name in layers is matched.
+    """
+    if pattern.groups < 1:
+        return set()
+    if joined:
+        matches = pattern.finditer(joined_layers)
+    else:
+        matches = filter(None, map(pattern.match, layers))
+    return {
+        int(val) for m in matches
+        # Could be a year (2024) or version string (V1)
+        if (val := m.group(1)) and val.isdigit() and len(val) == 4
+    }
+
+
+# URL builders and host_from_url are called for the same few base URLs on
+# every fetch; all arguments are strings, so results are memoized
+@functools.lru_cache(maxsize=256)
 def build_getcap_url(base_url, wms_version="1.1.1"):
     sep = "&" if "?" in base_url else "?"
     return f"{base_url}{sep}SERVICE=WMS&REQUEST=GetCapabilities&VERSION={wms_version}"
 
 
+@functools.lru_cache(maxsize=256)
 def build_getmap_url(base_url, layers, crs, wms_version, bbox, width=256, height=256):
     """Build a minimal GetMap URL for speed testing."""
     sep = "&" if "?" in base_url else "?"
@@ -152,18 +312,165 @@ def build_getmap_url(base_url, layers, crs, wms_version, bbox, width=256, height
     )
 
 
+async def read_head(resp, n):
+    """Read at most the first n bytes of a response body."""
+    head = b""
+    while len(head) < n:
+        chunk = await resp.content.read(n - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+
+@functools.lru_cache(maxsize=256)
 def host_from_url(url):
     return urlparse(url).hostname or "unknown"
 
 
+async def prewarm_dns(connector, urls):
+    """Resolve every host in parallel before any check starts.
+
+    Lookups go through the connector's own resolver and land in its DNS
+    cache, keyed by (host, port) as requests look them up. aiohttp has no
+    public hook for this, hence _resolve_host, and the prewarm is skipped
+    on versions without it; a failed lookup is simply retried by the first
+    real request.
+    """
+    resolve = getattr(connector, "_resolve_host", None)
+    if resolve is None:
+        return
+    targets = set()
+    for url in urls:
+        parts = urlparse(url)
+        if parts.hostname:
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            targets.add((parts.hostname, port))
+    await asyncio.gather(
+        *[resolve(host, port) for host, port in targets],
+        return_exceptions=True,
+    )
+
+
+class RacingResolver(AbstractResolver):
+    """Ask several nameservers at once and take the first answer.
+
+    Some WMS hosts (JRC, PDOK, Géoplateforme) sit behind slow DNS; racing
+    resolvers trades a few extra UDP packets for the fastest reply.
+    """
+    def __init__(self, nameservers):
+        self._resolvers = [aiohttp.AsyncResolver(nameservers=[ns]) for ns in nameservers]
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        pending = {asyncio.ensure_future(r.resolve(host, port, family)) for r in self._resolvers}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error or OSError(None, f"DNS lookup failed for {host}")
+
+    async def close(self):
+        for r in self._resolvers:
+            await r.close()
+
+
+def latency_trace_config():
+    """TraceConfig timing each request from headers sent to response headers.
+
+    Pass a dict as trace_request_ctx and it receives "ms" once the response
+    starts, so reported latency excludes semaphore, pool and connect waits.
+    """
+    async def on_headers_sent(session, ctx, params):
+        ctx.t0 = asyncio.get_running_loop().time()
+
+    async def on_request_end(session, ctx, params):
+        timing = ctx.trace_request_ctx
+        if isinstance(timing, dict) and hasattr(ctx, "t0"):
+            timing["ms"] = (asyncio.get_running_loop().time() - ctx.t0) * 1000
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_headers_sent.append(on_headers_sent)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+def latency_of(timing):
+    """Rounded latency recorded by latency_trace_config, or None."""
+    ms = timing.get("ms")
+    return round(ms) if ms is not None else None
+
+
 # ─── Semaphore management ────────────────────────────────────────────
 
+class DynamicSemaphore:
+    """Semaphore whose limit can change while tasks are waiting.
+
+    An asyncio.Condition guards an explicit in-flight counter, so raising
+    the limit admits waiters immediately and lowering it simply delays new
+    admissions. Hold times and timeouts are recorded for autotune().
+    """
+    def __init__(self, limit, floor=1, ceiling=None):
+        self.active = 0
+        self.limit = limit
+        self.floor = floor
+        self.ceiling = ceiling or limit
+        self._cond = asyncio.Condition()
+        self._hold_ms = []
+        self._timeouts = 0
+        self._starts = {}  # task -> acquire time, for `async with` holders
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        return time.monotonic()
+
+    async def release(self, t0=None, timed_out=False):
+        async with self._cond:
+            self.active -= 1
+            if t0 is not None:
+                self._hold_ms.append((time.monotonic() - t0) * 1000)
+            self._timeouts += timed_out
+            self._cond.notify(1)
+
+    async def __aenter__(self):
+        self._starts[asyncio.current_task()] = await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        t0 = self._starts.pop(asyncio.current_task(), None)
+        # Subclasses count too, e.g. aiohttp's ConnectionTimeoutError
+        timed_out = exc_type is not None and issubclass(exc_type, asyncio.TimeoutError)
+        await self.release(t0, timed_out=timed_out)
+
+    async def resize(self, limit):
+        async with self._cond:
+            self.limit = max(self.floor, min(self.ceiling, limit))
+            self._cond.notify_all()
+
+    async def autotune(self, interval=AUTOTUNE_INTERVAL, fast_ms=AUTOTUNE_FAST_MS):
+        """Back off on timeouts, open up while hosts answer quickly."""
+        while True:
+            await asyncio.sleep(interval)
+            hold, self._hold_ms = sorted(self._hold_ms), []
+            timeouts, self._timeouts = self._timeouts, 0
+            if timeouts:
+                await self.resize(self.limit - 1)
+            elif hold and hold[len(hold) // 2] < fast_ms:
+                await self.resize(self.limit + 1)
+
+
 _host_sems = {}
 
 def get_host_sem(host):
-    if host not in _host_sems:
-        _host_sems[host] = asyncio.Semaphore(MAX_HOST_CONCURRENT)
-    return _host_sems[host]
+    return _host_sems.get(host) or _host_sems.setdefault(host, asyncio.Semaphore(MAX_HOST_CONCURRENT))
 
 
 # ─── Check functions ─────────────────────────────────────────────────
@@ -180,81 +487,73 @@ class SourceResult:
         self.discovered_years = None  # list from discovery
         self.new_years = []        # years found that weren't known
         self.removed_years = []    # years in registry but not on server
-        self.all_layers = []       # all layer names found (verbose)
+        self.all_layers = frozenset()  # all layer names found (unsorted; sort when printing)
         self.error = None
         self.notes = ""
         self.mirror_results = []   # [{label, latency_ms, status}]
 
 
-async def check_getcapabilities_source(
-    session, global_sem, source_id, source, verbose=False
-):
-    """Fetch GetCapabilities and regex-match layers to discover years."""
-    result = SourceResult(source_id, source["name"], "GetCap")
-    result.current_years = source.get("available_years") or []
+# Outcome of one GetCapabilities request; layers is None unless status is OK
+FetchResult = namedtuple("FetchResult", "status latency_ms layers error")
 
-    base_url = source["wms_base_url"]
-    if not base_url:
-        result.status = "SKIPPED"
-        result.notes = "No WMS URL"
-        return result
+# Per-source dispatch facts resolved once before any request is made
+SourcePlan = namedtuple("SourcePlan", "sid src method base_url wms_version host")
 
-    url = build_getcap_url(base_url, source.get("wms_version", "1.1.1"))
-    host = host_from_url(base_url)
-    host_sem = get_host_sem(host)
 
+def plan_sources(sources, source_filter=None):
+    """Resolve method, URL, version and host for each selected source."""
+    plan = []
+    for sid, src in sources.items():
+        if source_filter and sid != source_filter:
+            continue
+        base_url = src.get("wms_base_url")
+        host_url = base_url or src.get("probe_url_template")
+        plan.append(SourcePlan(
+            sid, src, src.get("year_discovery", "fixed"), base_url,
+            src.get("wms_version", "1.1.1"),
+            host_from_url(host_url) if host_url else None,
+        ))
+    return plan
+
+
+async def _fetch_getcap(session, global_sem, base_url, wms_version, verbose=False, host=None):
+    """GET and parse a GetCapabilities document (shared by every GetCap check)."""
+    url = build_getcap_url(base_url, wms_version)
+    host = host or host_from_url(base_url)
+    host_sem = get_host_sem(host)
     try:
+        timing = {}
         async with global_sem, host_sem:
-            t0 = time.monotonic()
-            async with session.get(url, timeout=TIMEOUT) as resp:
-                raw = await resp.read()
-                elapsed = (time.monotonic() - t0) * 1000
-                result.latency_ms = round(elapsed)
-
+            async with session.get(url, timeout=TIMEOUT, trace_request_ctx=timing) as resp:
+                latency = latency_of(timing)
                 if resp.status != 200:
-                    result.status = "ERROR"
-                    result.error = f"HTTP {resp.status}"
-                    return result
-                # Try UTF-8, fall back to latin-1 (some EU WMS servers)
-                try:
-                    text = raw.decode("utf-8")
-                except UnicodeDecodeError:
-                    text = raw.decode("latin-1")
+                    return FetchResult("ERROR", latency, None, f"HTTP {resp.status}")
+                raw = await resp.read()
     except asyncio.TimeoutError:
-        result.status = "TIMEOUT"
-        result.error = ">45s"
-        return result
+        return FetchResult("TIMEOUT", None, None, ">45s")
     except Exception as e:
-        result.status = "ERROR"
-        result.error = str(e)[:120]
-        return result
+        return FetchResult("ERROR", None, None, str(e)[:120])
 
-    layers = parse_layers_from_xml(text, verbose)
-    result.all_layers = sorted(layers)
+    # Bytes go straight to the parser, which honours the XML encoding declaration
+    layers = frozenset(parse_layers_from_xml(raw, verbose))
+    return FetchResult("OK", latency, layers, None)
 
-    if verbose:
-        print(f"  [{source_id}] {len(layers)} layers from {host}")
 
+def apply_layer_regex(result, source, layers, joined_layers=None):
+    """Fill discovered/new/removed years on result from a source's layer_regex."""
     regex = source.get("layer_regex")
+    result.status = "OK"
     if not regex:
-        result.status = "OK"
         result.notes = f"{len(layers)} layers (no regex)"
-        return result
-
-    pattern = re.compile(regex)
-    discovered_years = set()
-    for layer_name in layers:
-        m = pattern.match(layer_name)
-        if m and m.lastindex and m.lastindex >= 1:
-            val = m.group(1)
-            # Could be a year (2024) or version string (V1)
-            if val.isdigit() and len(val) == 4:
-                discovered_years.add(int(val))
-
-    result.discovered_years = sorted(discovered_years) if discovered_years else None
-    current_set = set(result.current_years)
+        return
 
+    pattern, joined = compile_layer_regex(regex)
+    if joined and joined_layers is None:
+        joined_layers = "\n".join(layers)
+    discovered_years = years_from_layers(pattern, joined, layers, joined_layers)
     if discovered_years:
+        current_set = set(result.current_years)
+        result.discovered_years = sorted(discovered_years)
         result.new_years = sorted(discovered_years - current_set)
         result.removed_years = sorted(current_set - discovered_years)
     else:
@@ -265,16 +564,76 @@ async def check_getcapabilities_source(
         else:
             result.notes = f"Regex '{regex}' matched no layers"
 
-    result.status = "OK"
+
+async def check_getcapabilities_source(
+    session, global_sem, source_id, source, verbose=False
+):
+    """Fetch GetCapabilities and regex-match layers to discover years."""
+    result = SourceResult(source_id, source["name"], "GetCap")
+    result.current_years = sorted(source.get("available_years") or [])
+
+    base_url = source["wms_base_url"]
+    if not base_url:
+        result.status = "SKIPPED"
+        result.notes = "No WMS URL"
+        return result
+
+    fetch = await _fetch_getcap(
+        session, global_sem, base_url, source.get("wms_version", "1.1.1"), verbose
+    )
+    result.latency_ms = fetch.latency_ms
+    if fetch.layers is None:
+        result.status = fetch.status
+        result.error = fetch.error
+        return result
+
+    result.all_layers = fetch.layers
+    if verbose:
+        print(f"  [{source_id}] {len(fetch.layers)} layers from {host_from_url(base_url)}")
+
+    apply_layer_regex(result, source, fetch.layers)
     return result
 
 
+async def _fetch_and_parse(session, global_sem, base_url, wms_version, grp, verbose=False):
+    """Fetch one GetCapabilities document and apply every grouped source's regex."""
+    fetch = await _fetch_getcap(
+        session, global_sem, base_url, wms_version, verbose, grp[0].host
+    )
+    if fetch.layers is not None and verbose:
+        print(f"  Coalesced fetch: {grp[0].host} → {len(fetch.layers)} layers")
+
+    # One joined string per host, scanned by every source's regex
+    joined_layers = "\n".join(fetch.layers) if fetch.layers is not None else ""
+    results = []
+    for p in grp:
+        src = p.src
+        r = SourceResult(p.sid, src["name"], "GetCap")
+        r.latency_ms = fetch.latency_ms
+        r.current_years = sorted(src.get("available_years") or [])
+        if fetch.layers is None:
+            r.status = fetch.status
+            r.error = fetch.error
+        else:
+            r.all_layers = fetch.layers
+            apply_layer_regex(r, src, fetch.layers, joined_layers)
+        results.append(r)
+    return results
+
+
 async def check_probe_url_source(
-    session, global_sem, source_id, source, verbose=False
+    session, global_sem, source_id, source, verbose=False, full_probe=False
 ):
-    """Probe year-templated URLs via HEAD requests."""
+    """Probe year-templated URLs via HEAD requests.
+
+    By default only the oldest and newest registry years are re-checked and
+    newer years are found by galloping then bisecting (availability is a
+    contiguous run of years), so a typical source costs ~3 requests. If
+    either known end has vanished, or full_probe is set, every year in the
+    probe range is checked.
+    """
     result = SourceResult(source_id, source["name"], "Probe")
-    result.current_years = source.get("available_years") or []
+    result.current_years = sorted(source.get("available_years") or [])
     current_set = set(result.current_years)
 
     template = source.get("probe_url_template")
@@ -290,37 +649,91 @@ async def check_probe_url_source(
     host = host_from_url(base_url)
     host_sem = get_host_sem(host)
 
-    discovered = set()
-    first_latency = None
-
-    for year in years_to_probe:
+    async def _probe_one(year):
+        """Probe one year; returns (year, ok, latency_ms)."""
         url = template.replace("{year}", str(year))
+        timing = {}
         try:
             async with global_sem, host_sem:
-                t0 = time.monotonic()
-                async with session.get(url, timeout=TIMEOUT) as resp:
-                    elapsed = (time.monotonic() - t0) * 1000
-                    if first_latency is None:
-                        first_latency = round(elapsed)
-                    if resp.status == 200:
-                        # Quick check: valid XML response (not error page)
-                        text = await resp.text()
-                        if "<WMS_Capabilities" in text or "<WMT_MS_Capabilities" in text:
-                            discovered.add(year)
-                            if verbose:
-                                print(f"  [{source_id}] year {year}: OK ({round(elapsed)}ms)")
-                        else:
-                            if verbose:
-                                print(f"  [{source_id}] year {year}: HTTP 200 but not WMS XML")
-                    else:
+                # HEAD screens out missing years without transferring a body
+                async with session.head(
+                    url, allow_redirects=True, timeout=TIMEOUT, trace_request_ctx=timing
+                ) as resp:
+                    elapsed = latency_of(timing)
+                    status = resp.status
+                if status == 200:
+                    if verbose:
+                        print(f"  [{source_id}] year {year}: OK ({elapsed}ms)")
+                    return year, True, elapsed
+                if status not in (405, 501):
+                    if verbose:
+                        print(f"  [{source_id}] year {year}: HTTP {status}")
+                    return year, False, elapsed
+                # HEAD unsupported: GET and confirm the body is WMS XML.
+                # Only the document head is needed, so ask for a byte range.
+                async with session.get(url, headers=PROBE_RANGE_HEADER, timeout=TIMEOUT) as resp:
+                    if resp.status not in (200, 206):
                         if verbose:
                             print(f"  [{source_id}] year {year}: HTTP {resp.status}")
+                        return year, False, elapsed
+                    # Quick check: valid XML response (not error page)
+                    head = await read_head(resp, PROBE_HEAD_BYTES)
+                    # Done with the body: don't drain the rest of a large document
+                    resp.release()
+                    if any(magic in head for magic in WMS_CAPABILITIES_MAGIC):
+                        if verbose:
+                            print(f"  [{source_id}] year {year}: OK ({elapsed}ms)")
+                        return year, True, elapsed
+                    if verbose:
+                        print(f"  [{source_id}] year {year}: HTTP 200 but not WMS XML")
+                    return year, False, elapsed
         except asyncio.TimeoutError:
             if verbose:
                 print(f"  [{source_id}] year {year}: TIMEOUT")
         except Exception as e:
             if verbose:
                 print(f"  [{source_id}] year {year}: {e}")
+        return year, False, None
+
+    async def _probe_many(years):
+        # Fan out; the global/host semaphores still bound concurrency
+        outcomes = await asyncio.gather(*[_probe_one(y) for y in years], return_exceptions=True)
+        return [o for o in outcomes if not isinstance(o, BaseException)]
+
+    if full_probe or not current_set:
+        outcomes = await _probe_many(years_to_probe)
+        discovered = {year for year, ok, _ in outcomes if ok}
+    else:
+        oldest, newest = result.current_years[0], result.current_years[-1]
+        outcomes = await _probe_many(sorted({oldest, newest}))
+        if not all(ok for _, ok, _ in outcomes):
+            # Registry is stale at one end: sweep to get the full picture
+            outcomes += await _probe_many([y for y in years_to_probe if y not in (oldest, newest)])
+            discovered = {year for year, ok, _ in outcomes if ok}
+        else:
+            discovered = set(current_set)
+            last = years_to_probe[-1] if years_to_probe else newest
+            # Gallop upwards from the newest known year until a miss...
+            last_hit, step, miss = newest, 1, None
+            while last_hit < last:
+                outcome = await _probe_one(min(last_hit + step, last))
+                outcomes.append(outcome)
+                if not outcome[1]:
+                    miss = outcome[0]
+                    break
+                last_hit, step = outcome[0], step * 2
+            # ...then bisect the gap between the last hit and that miss
+            while miss is not None and miss - last_hit > 1:
+                outcome = await _probe_one((last_hit + miss) // 2)
+                outcomes.append(outcome)
+                if outcome[1]:
+                    last_hit = outcome[0]
+                else:
+                    miss = outcome[0]
+            discovered.update(range(newest + 1, last_hit + 1))
+
+    latencies = [lat for _, _, lat in outcomes if lat is not None]
+    first_latency = min(latencies) if latencies else None
 
     result.latency_ms = first_latency
     result.discovered_years = sorted(discovered) if discovered else None
@@ -344,40 +757,24 @@ async def check_fixed_source(
         result.notes = "No WMS URL"
         return result
 
-    url = build_getcap_url(base_url, source.get("wms_version", "1.1.1"))
-    host = host_from_url(base_url)
-    host_sem = get_host_sem(host)
+    fetch = await _fetch_getcap(
+        session, global_sem, base_url, source.get("wms_version", "1.1.1"), verbose
+    )
+    result.latency_ms = fetch.latency_ms
+    if fetch.layers is None:
+        result.status = fetch.status
+        result.error = fetch.error
+        return result
 
-    try:
-        async with global_sem, host_sem:
-            t0 = time.monotonic()
-            async with session.get(url, timeout=TIMEOUT) as resp:
-                elapsed = (time.monotonic() - t0) * 1000
-                result.latency_ms = round(elapsed)
-                if resp.status == 200:
-                    raw = await resp.read()
-                    try:
-                        text = raw.decode("utf-8")
-                    except UnicodeDecodeError:
-                        text = raw.decode("latin-1")
-                    layers = parse_layers_from_xml(text, verbose)
-                    result.all_layers = sorted(layers)
-                    result.status = "OK"
-                    result.notes = f"{len(layers)} layers"
-
-                    # Check that the expected layer actually exists
-                    expected = source.get("wms_layers", "")
-                    if expected and expected not in layers:
-                        result.notes += f" ⚠ expected '{expected}' NOT FOUND"
-                else:
-                    result.status = "ERROR"
-                    result.error = f"HTTP {resp.status}"
-    except asyncio.TimeoutError:
-        result.status = "TIMEOUT"
-        result.error = ">45s"
-    except Exception as e:
-        result.status = "ERROR"
-        result.error = str(e)[:120]
+    layers = fetch.layers
+    result.all_layers = layers
+    result.status = "OK"
+    result.notes = f"{len(layers)} layers"
+
+    # Check that the expected layer actually exists
+    expected = source.get("wms_layers", "")
+    if expected and expected not in layers:
+        result.notes += f" ⚠ expected '{expected}' NOT FOUND"
 
     return result
 
@@ -398,14 +795,13 @@ async def check_non_wms(session, global_sem, key, config, verbose=False):
     host = host_from_url(url)
     host_sem = get_host_sem(host)
 
+    timing = {}
     try:
         method = "HEAD" if config["check_type"] == "head_request" else "GET"
         async with global_sem, host_sem:
-            t0 = time.monotonic()
             if method == "HEAD":
-                async with session.head(url, timeout=TIMEOUT) as resp:
-                    elapsed = (time.monotonic() - t0) * 1000
-                    result.latency_ms = round(elapsed)
+                async with session.head(url, timeout=TIMEOUT, trace_request_ctx=timing) as resp:
+                    result.latency_ms = latency_of(timing)
                     if resp.status == 200:
                         result.status = "OK"
                         cl = resp.headers.get("Content-Length")
@@ -416,11 +812,10 @@ async def check_non_wms(session, global_sem, key, config, verbose=False):
                         result.status = "ERROR"
                         result.error = f"HTTP {resp.status}"
             else:
-                async with session.get(url, timeout=TIMEOUT) as resp:
-                    elapsed = (time.monotonic() - t0) * 1000
-                    result.latency_ms = round(elapsed)
+                async with session.get(url, timeout=TIMEOUT, trace_request_ctx=timing) as resp:
+                    result.latency_ms = latency_of(timing)
                     if resp.status == 200:
-                        data = await resp.json()
+                        data = json_loads(await resp.read())
                         count = len(data) if isinstance(data, list) else "?"
                         expected = config.get("expected_min_size", 0)
                         if isinstance(count, int) and count >= expected:
@@ -461,16 +856,16 @@ async def speed_test_mirror(session, global_sem, mirror, verbose=False):
     host = host_from_url(base_url)
     host_sem = get_host_sem(host)
 
+    timing = {}
     try:
         async with global_sem, host_sem:
-            t0 = time.monotonic()
-            async with session.get(url, timeout=TIMEOUT) as resp:
+            async with session.get(url, timeout=TIMEOUT, trace_request_ctx=timing) as resp:
                 data = await resp.read()
-                elapsed = (time.monotonic() - t0) * 1000
+                latency = latency_of(timing)
                 if resp.status == 200 and len(data) > 100:
-                    return {"label": mirror["label"], "latency_ms": round(elapsed), "status": "OK", "size": len(data)}
+                    return {"label": mirror["label"], "latency_ms": latency, "status": "OK", "size": len(data)}
                 else:
-                    return {"label": mirror["label"], "latency_ms": round(elapsed), "status": f"HTTP {resp.status}", "size": 0}
+                    return {"label": mirror["label"], "latency_ms": latency, "status": f"HTTP {resp.status}", "size": 0}
     except asyncio.TimeoutError:
         return {"label": mirror["label"], "latency_ms": None, "status": "TIMEOUT", "size": 0}
     except Exception as e:
@@ -478,201 +873,159 @@ async def speed_test_mirror(session, global_sem, mirror, verbose=False):
 
 
 async def run_speed_tests(session, global_sem, verbose=False):
-    """Run speed tests for all alternative mirrors."""
-    results = {}
-    tasks = []
+    """Run speed tests for all alternative mirrors.
+
+    Mirrors on the same host are tested one after another so they share a
+    warm keep-alive connection (and don't skew each other's latency);
+    different hosts still run concurrently.
+    """
+    by_host = {}
     for source_id, mirrors in ALTERNATIVE_MIRRORS.items():
         for mirror in mirrors:
-            tasks.append((source_id, speed_test_mirror(session, global_sem, mirror, verbose)))
+            by_host.setdefault(host_from_url(mirror["base_url"]), []).append((source_id, mirror))
 
-    coros = [t[1] for t in tasks]
-    outcomes = await asyncio.gather(*coros, return_exceptions=True)
+    async def test_host(entries):
+        outcomes = []
+        for source_id, mirror in entries:
+            try:
+                outcome = await speed_test_mirror(session, global_sem, mirror, verbose)
+            except Exception as e:
+                outcome = {"label": mirror["label"], "latency_ms": None, "status": str(e)[:80], "size": 0}
+            outcomes.append((source_id, outcome))
+        return outcomes
 
-    for (source_id, _), outcome in zip(tasks, outcomes):
-        if isinstance(outcome, Exception):
-            outcome = {"label": "?", "latency_ms": None, "status": str(outcome)[:80], "size": 0}
-        results.setdefault(source_id, []).append(outcome)
+    host_outcomes = await asyncio.gather(*[test_host(e) for e in by_host.values()])
 
+    results = {}
+    for outcomes in host_outcomes:
+        for source_id, outcome in outcomes:
+            results.setdefault(source_id, []).append(outcome)
     return results
 
 
 # ─── Coalesce GetCapabilities fetches by host ────────────────────────
 
-async def run_all_checks(registry, source_filter=None, verbose=False, do_speed_test=False):
+async def run_all_checks(registry, source_filter=None, verbose=False, do_speed_test=False,
+                         full_probe=False):
     """Run all checks and return list of SourceResult."""
     results = []
 
-    connector = aiohttp.TCPConnector(limit=12, limit_per_host=3, ttl_dns_cache=300)
-    global_sem = asyncio.Semaphore(MAX_GLOBAL_CONCURRENT)
-
-    async with aiohttp.ClientSession(connector=connector) as session:
-        sources = registry["sources"]
-        tasks = []
-
-        # Group GetCapabilities sources by base URL to coalesce fetches
-        getcap_hosts = {}
-        for sid, src in sources.items():
-            if source_filter and sid != source_filter:
-                continue
-            method = src.get("year_discovery", "fixed")
-            if method == "getcapabilities_regex" and src.get("wms_base_url"):
-                host = src["wms_base_url"]
-                getcap_hosts.setdefault(host, []).append((sid, src))
-
-        # For coalesced hosts, only fetch GetCapabilities once
-        getcap_cache = {}
-        coalesced_sids = set()
-
-        for base_url, group in getcap_hosts.items():
-            # Use the first source's WMS version
-            wms_version = group[0][1].get("wms_version", "1.1.1")
-            coalesced_sids.update(sid for sid, _ in group)
-
-            async def fetch_and_parse(url, ver, grp):
-                url_full = build_getcap_url(url, ver)
-                host = host_from_url(url)
-                host_sem = get_host_sem(host)
-                results_local = []
-                try:
-                    async with global_sem, host_sem:
-                        t0 = time.monotonic()
-                        async with session.get(url_full, timeout=TIMEOUT) as resp:
-                            raw = await resp.read()
-                            elapsed = (time.monotonic() - t0) * 1000
-                            latency = round(elapsed)
-                            if resp.status != 200:
-                                for sid, src in grp:
-                                    r = SourceResult(sid, src["name"], "GetCap")
-                                    r.status = "ERROR"
-                                    r.error = f"HTTP {resp.status}"
-                                    r.latency_ms = latency
-                                    r.current_years = src.get("available_years") or []
-                                    results_local.append(r)
-                                return results_local
-
-                    try:
-                        text = raw.decode("utf-8")
-                    except UnicodeDecodeError:
-                        text = raw.decode("latin-1")
-                    layers = parse_layers_from_xml(text, verbose)
-                    if verbose:
-                        print(f"  Coalesced fetch: {host} → {len(layers)} layers")
-
-                    for sid, src in grp:
-                        r = SourceResult(sid, src["name"], "GetCap")
-                        r.latency_ms = latency
-                        r.current_years = src.get("available_years") or []
-                        r.all_layers = sorted(layers)
-
-                        regex = src.get("layer_regex")
-                        if regex:
-                            pattern = re.compile(regex)
-                            discovered = set()
-                            matched_layers = []
-                            for layer_name in layers:
-                                m = pattern.match(layer_name)
-                                if m:
-                                    matched_layers.append(layer_name)
-                                    if m.lastindex and m.lastindex >= 1:
-                                        val = m.group(1)
-                                        if val.isdigit() and len(val) == 4:
-                                            discovered.add(int(val))
-
-                            if discovered:
-                                r.discovered_years = sorted(discovered)
-                                current_set = set(r.current_years)
-                                r.new_years = sorted(discovered - current_set)
-                                r.removed_years = sorted(current_set - discovered)
-                            else:
-                                if matched_layers:
-                                    r.notes = f"Regex matches: {matched_layers[:5]}"
-                                else:
-                                    r.notes = f"Regex '{regex}' matched no layers"
-                        else:
-                            r.notes = f"{len(layers)} layers (no regex)"
-
-                        r.status = "OK"
-                        results_local.append(r)
-
-                except asyncio.TimeoutError:
-                    for sid, src in grp:
-                        r = SourceResult(sid, src["name"], "GetCap")
-                        r.status = "TIMEOUT"
-                        r.error = ">45s"
-                        r.current_years = src.get("available_years") or []
-                        results_local.append(r)
-                except Exception as e:
-                    for sid, src in grp:
-                        r = SourceResult(sid, src["name"], "GetCap")
-                        r.status = "ERROR"
-                        r.error = str(e)[:120]
-                        r.current_years = src.get("available_years") or []
-                        results_local.append(r)
-
-                return results_local
-
-            tasks.append(fetch_and_parse(base_url, wms_version, group))
-
-        # Non-coalesced sources
-        for sid, src in sources.items():
-            if source_filter and sid != source_filter:
-                continue
-            if sid in coalesced_sids:
-                continue
-
-            method = src.get("year_discovery", "fixed")
-            if method == "getcapabilities_regex":
-                tasks.append(check_getcapabilities_source(session, global_sem, sid, src, verbose))
-            elif method == "probe_url":
-                tasks.append(check_probe_url_source(session, global_sem, sid, src, verbose))
-            elif method == "not_available":
-                tasks.append(check_not_available_source(sid, src))
-            else:  # fixed
-                tasks.append(check_fixed_source(session, global_sem, sid, src, verbose))
-
-        # Non-WMS checks
-        non_wms = registry.get("non_wms_checks", {})
-        for key, cfg in non_wms.items():
-            if source_filter and key != source_filter:
-                continue
-            tasks.append(check_non_wms(session, global_sem, key, cfg, verbose))
-
-        # Run all tasks concurrently
-        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for outcome in outcomes:
-            if isinstance(outcome, list):
-                results.extend(outcome)
-            elif isinstance(outcome, SourceResult):
-                results.append(outcome)
-            elif isinstance(outcome, Exception):
-                print(f"  Task exception: {outcome}")
-
-        # Speed tests
-        speed_results = {}
-        if do_speed_test:
-            speed_results = await run_speed_tests(session, global_sem, verbose)
-
+    plan = plan_sources(registry["sources"], source_filter)
+    non_wms = {
+        key: cfg for key, cfg in registry.get("non_wms_checks", {}).items()
+        if not source_filter or key == source_filter
+    }
+
+    # IPv4-only lookups go with the racing resolver; the default resolver
+    # keeps AF_UNSPEC so IPv6-only hosts still connect
+    resolver_kwargs = (
+        {"resolver": RacingResolver(DNS_NAMESERVERS), "family": socket.AF_INET}
+        if HAS_AIODNS else {}
+    )
+    connector = aiohttp.TCPConnector(
+        limit=12, limit_per_host=3, ttl_dns_cache=3600, use_dns_cache=True,
+        **resolver_kwargs,
+    )
+    # DNS lookups for every host overlap here instead of each stalling the
+    # first request to that host once the semaphores are serialising work
+    urls = {p.base_url or p.src.get("probe_url_template") for p in plan} | {
+        cfg["check_url"] for cfg in non_wms.values()
+    }
+    await prewarm_dns(connector, filter(None, urls))
+    floor, ceiling = GLOBAL_CONCURRENT_RANGE
+    global_sem = DynamicSemaphore(MAX_GLOBAL_CONCURRENT, floor, ceiling)
+    autotune = asyncio.create_task(global_sem.autotune())
+
+    # Keep-alive (aiohttp default) reuses connections across probe years
+    try:
+        async with aiohttp.ClientSession(
+            connector=connector, headers=SESSION_HEADERS, trace_configs=[latency_trace_config()]
+        ) as session:
+            tasks = []
+
+            # Group GetCapabilities sources by base URL to coalesce fetches
+            getcap_hosts = {}
+            for p in plan:
+                if p.method == "getcapabilities_regex" and p.base_url:
+                    getcap_hosts.setdefault(p.base_url, []).append(p)
+
+            # For coalesced hosts, only fetch GetCapabilities once
+            coalesced_sids = set()
+
+            for base_url, group in getcap_hosts.items():
+                coalesced_sids.update(p.sid for p in group)
+
+                # Use the first source's WMS version
+                tasks.append(_fetch_and_parse(
+                    session, global_sem, base_url, group[0].wms_version, group, verbose
+                ))
+
+            # Non-coalesced sources
+            for p in plan:
+                if p.sid in coalesced_sids:
+                    continue
+                if p.method == "getcapabilities_regex":
+                    tasks.append(check_getcapabilities_source(session, global_sem, p.sid, p.src, verbose))
+                elif p.method == "probe_url":
+                    tasks.append(check_probe_url_source(
+                        session, global_sem, p.sid, p.src, verbose, full_probe
+                    ))
+                elif p.method == "not_available":
+                    tasks.append(check_not_available_source(p.sid, p.src))
+                else:  # fixed
+                    tasks.append(check_fixed_source(session, global_sem, p.sid, p.src, verbose))
+
+            # Non-WMS checks
+            for key, cfg in non_wms.items():
+                tasks.append(check_non_wms(session, global_sem, key, cfg, verbose))
+
+            # Run all tasks concurrently
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+            for outcome in outcomes:
+                if isinstance(outcome, list):
+                    results.extend(outcome)
+                elif isinstance(outcome, SourceResult):
+                    results.append(outcome)
+                elif isinstance(outcome, Exception):
+                    print(f"  Task exception: {outcome}")
+
+            # Speed tests
+            speed_results = {}
+            if do_speed_test:
+                speed_results = await run_speed_tests(session, global_sem, verbose)
+    finally:
+        autotune.cancel()
     return results, speed_results
 
 
 # ─── Report builder ──────────────────────────────────────────────────
 
+# Report row layouts (one trailing newline each)
+DISCOVERY_ROW = "{:<24} {:<8} {:<18} {:<18} {}\n"
+UP_TO_DATE_ROW = "  {:<24} {:<18} OK ({}ms)\n"
+HEALTH_ROW = "{:<24} {:<10} {:<10} {}\n"
+SPEED_ROW = "{:<20} {:<35} {:<10} {:<10} {}\n"
+STATUS_LABELS = {"OK": "OK", "TIMEOUT": "TIMEOUT", "ERROR": "ERROR",
+                 "WARNING": "WARNING", "NOT_AVAILABLE": "N/A", "SKIPPED": "SKIP"}
+
+
 def build_report(results, speed_results=None):
     """Build a formatted text report from check results."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    lines = []
-    lines.append(f"{'='*64}")
-    lines.append(f"  ARCcrop Source Check — {now}")
-    lines.append(f"{'='*64}")
-    lines.append("")
+    buf = io.StringIO()
+    W = buf.write
+    W(f"{'='*64}\n")
+    W(f"  ARCcrop Source Check — {now}\n")
+    W(f"{'='*64}\n")
+    W("\n")
 
     # --- Year Discovery ---
     discovery_results = [r for r in results if r.discovered_years is not None or r.new_years]
     if discovery_results:
-        lines.append("--- Year Discovery ---")
-        lines.append(f"{'Source':<24} {'Method':<8} {'Current':<18} {'Discovered':<18} {'Action'}")
-        lines.append("-" * 90)
+        W("--- Year Discovery ---\n")
+        W(DISCOVERY_ROW.format("Source", "Method", "Current", "Discovered", "Action"))
+        W("-" * 90 + "\n")
         for r in sorted(discovery_results, key=lambda x: x.source_id):
             current_str = _year_range_str(r.current_years) if r.current_years else "—"
             disc_str = _year_range_str(r.discovered_years) if r.discovered_years else "—"
@@ -682,49 +1035,47 @@ def build_report(results, speed_results=None):
                 action = f"REMOVED: {', '.join(str(y) for y in r.removed_years)}"
             else:
                 action = "unchanged"
-            lines.append(f"{r.source_id:<24} {r.method:<8} {current_str:<18} {disc_str:<18} {action}")
-        lines.append("")
+            W(DISCOVERY_ROW.format(r.source_id, r.method, current_str, disc_str, action))
+        W("\n")
 
     # --- Sources with no changes ---
     unchanged = [r for r in results if r.status == "OK" and not r.new_years and r.method in ("GetCap", "Probe")]
     if unchanged:
-        lines.append("--- Up to Date ---")
+        W("--- Up to Date ---\n")
         for r in sorted(unchanged, key=lambda x: x.source_id):
             current_str = _year_range_str(r.current_years) if r.current_years else "—"
-            lines.append(f"  {r.source_id:<24} {current_str:<18} OK ({r.latency_ms}ms)")
-        lines.append("")
+            W(UP_TO_DATE_ROW.format(r.source_id, current_str, r.latency_ms))
+        W("\n")
 
     # --- Endpoint Health ---
-    lines.append("--- Endpoint Health ---")
-    lines.append(f"{'Source':<24} {'Status':<10} {'Latency':<10} {'Note'}")
-    lines.append("-" * 80)
+    W("--- Endpoint Health ---\n")
+    W(HEALTH_ROW.format("Source", "Status", "Latency", "Note"))
+    W("-" * 80 + "\n")
     for r in sorted(results, key=lambda x: x.source_id):
         latency_str = f"{r.latency_ms}ms" if r.latency_ms else "—"
         note = r.error or r.notes or ""
-        status_icon = {"OK": "OK", "TIMEOUT": "TIMEOUT", "ERROR": "ERROR",
-                       "WARNING": "WARNING", "NOT_AVAILABLE": "N/A", "SKIPPED": "SKIP"}
-        lines.append(f"{r.source_id:<24} {status_icon.get(r.status, r.status):<10} {latency_str:<10} {note[:50]}")
-    lines.append("")
+        W(HEALTH_ROW.format(r.source_id, STATUS_LABELS.get(r.status, r.status), latency_str, note[:50]))
+    W("\n")
 
     # --- Not Available (flagged for future) ---
     na = [r for r in results if r.status == "NOT_AVAILABLE"]
     if na:
-        lines.append("--- Not Available (flagged for future investigation) ---")
+        W("--- Not Available (flagged for future investigation) ---\n")
         for r in sorted(na, key=lambda x: x.source_id):
-            lines.append(f"  {r.source_id:<24} {r.notes}")
-        lines.append("")
+            W(f"  {r.source_id:<24} {r.notes}\n")
+        W("\n")
 
     # --- Speed Test ---
     if speed_results:
-        lines.append("--- Mirror Speed Test ---")
-        lines.append(f"{'Source':<20} {'Mirror':<35} {'Status':<10} {'Latency':<10} {'Size'}")
-        lines.append("-" * 90)
+        W("--- Mirror Speed Test ---\n")
+        W(SPEED_ROW.format("Source", "Mirror", "Status", "Latency", "Size"))
+        W("-" * 90 + "\n")
         for source_id in sorted(speed_results.keys()):
             for m in speed_results[source_id]:
                 lat = f"{m['latency_ms']}ms" if m['latency_ms'] else "—"
                 sz = f"{m['size']/1024:.1f}KB" if m['size'] else "—"
-                lines.append(f"{source_id:<20} {m['label']:<35} {m['status']:<10} {lat:<10} {sz}")
-        lines.append("")
+                W(SPEED_ROW.format(source_id, m['label'], m['status'], lat, sz))
+        W("\n")
 
     # --- Suggested Actions ---
     actions = []
@@ -743,21 +1094,23 @@ def build_report(results, speed_results=None):
             actions.append(f"Layer mismatch for {r.source_id}: {r.notes}")
 
     if actions:
-        lines.append("--- Suggested Actions ---")
+        W("--- Suggested Actions ---\n")
         for i, action in enumerate(actions, 1):
-            lines.append(f"  {i}. {action}")
-        lines.append("")
+            W(f"  {i}. {action}\n")
+        W("\n")
 
-    return "\n".join(lines)
+    # Rows carry their own newline; trim one so the output matches the
+    # previous "\n".join(lines) layout exactly
+    return buf.getvalue()[:-1]
 
 
 def _year_range_str(years):
-    """Compact year range: [2008,2009,...,2023] -> '2008-2023'"""
+    """Compact year range: [2008,2009,...,2023] -> '2008-2023' (years sorted)"""
     if not years:
         return "—"
     if len(years) == 1:
         return str(years[0])
-    return f"{min(years)}-{max(years)}"
+    return f"{years[0]}-{years[-1]}"
 
 
 # ─── Registry update ─────────────────────────────────────────────────
@@ -775,7 +1128,7 @@ def update_registry(registry, results):
 
             if r.discovered_years:
                 src["available_years"] = r.discovered_years
-                src["default_year"] = max(r.discovered_years)
+                src["default_year"] = r.discovered_years[-1]
 
         elif r.source_id in registry.get("non_wms_checks", {}):
             cfg = registry["non_wms_checks"][r.source_id]
@@ -792,7 +1145,8 @@ def generate_codegen(registry):
     patches = {"swift": [], "python": []}
 
     for sid, src in registry["sources"].items():
-        years = src.get("available_years")
+        # Sorted once here, in case the registry was edited by hand
+        years = sorted(src.get("available_years") or [])
         if not years or not src.get("swift_has_year_param"):
             continue
 
@@ -800,7 +1154,7 @@ def generate_codegen(registry):
         if not swift_case:
             continue
 
-        min_y, max_y = min(years), max(years)
+        min_y, max_y = years[0], years[-1]
 
         # Swift: update availableYears range
         patches["swift"].append({
@@ -844,11 +1198,14 @@ def apply_codegen(patches):
         with open(SWIFT_SOURCE, "r") as f:
             swift = f.read()
 
+        # Match "case .enumCase: MIN...MAX" pattern, compiled once per case
+        compiled = {
+            p["enum_case"]: re.compile(rf"(case \.{p['enum_case']}:\s*)\d+\.\.\.\d+")
+            for p in patches["swift"]
+        }
         for p in patches["swift"]:
-            # Match "case .enumCase: MIN...MAX" pattern
-            pattern = rf"(case \.{p['enum_case']}:\s*)\d+\.\.\.\d+"
             replacement = rf"\g<1>{p['range_str']}"
-            swift_new = re.sub(pattern, replacement, swift)
+            swift_new = compiled[p["enum_case"]].sub(replacement, swift)
             if swift_new != swift:
                 swift = swift_new
                 applied += 1
@@ -862,14 +1219,27 @@ def apply_codegen(patches):
         with open(PYTHON_OVERVIEW, "r") as f:
             python = f.read()
 
+        # Match "years": list(range(...)) inside each source block. One
+        # alternation over every source_id scans the file once, not per patch.
+        years_by_sid = {p["source_id"]: p["years_str"] for p in patches["python"]}
+        changed = set()
+
+        def _replace_years(m):
+            new = m.group(1) + years_by_sid[m.group(2)]
+            if new != m.group(0):
+                changed.add(m.group(2))
+            return new
+
+        if years_by_sid:
+            pattern = re.compile(
+                r'("(' + "|".join(map(re.escape, years_by_sid)) + r')".*?"years":\s*)'
+                r"list\(range\(\d+,\s*\d+\)\)",
+                re.DOTALL,
+            )
+            python = pattern.sub(_replace_years, python)
+
         for p in patches["python"]:
-            # Match "years": list(range(...)) or "years": [...]
-            # Look for the source block
-            pattern = rf'("{p["source_id"]}".*?"years":\s*)list\(range\(\d+,\s*\d+\)\)'
-            replacement = rf'\g<1>{p["years_str"]}'
-            python_new = re.sub(pattern, replacement, python, flags=re.DOTALL)
-            if python_new != python:
-                python = python_new
+            if p["source_id"] in changed:
                 applied += 1
                 print(f"  Applied: {p['source_id']} → {p['years_str']}")
 
@@ -894,6 +1264,8 @@ async def main():
                         help="Apply code patches to source files (requires --codegen)")
     parser.add_argument("--speed-test", "-t", action="store_true",
                         help="Benchmark alternative mirrors")
+    parser.add_argument("--full-probe", action="store_true",
+                        help="Probe every year of URL-templated sources")
     parser.add_argument("--verbose", "-v", action="store_true",
                         help="Show HTTP/XML details")
     parser.add_argument("--json", action="store_true",
@@ -904,8 +1276,8 @@ async def main():
         print(f"Error: {REGISTRY_PATH} not found")
         sys.exit(1)
 
-    with open(REGISTRY_PATH) as f:
-        registry = json.load(f)
+    with open(REGISTRY_PATH, "rb") as f:
+        registry = _jload(f)
 
     print(f"Loading {len(registry['sources'])} sources from source_registry.json...")
     if args.source:
@@ -917,6 +1289,7 @@ async def main():
         source_filter=args.source,
         verbose=args.verbose,
         do_speed_test=args.speed_test,
+        full_probe=args.full_probe,
     )
 
     if args.json:
@@ -934,21 +1307,23 @@ async def main():
                 "error": r.error,
                 "notes": r.notes,
             })
-        print(json.dumps(output, indent=2))
+        sys.stdout.flush()
+        _jdump(output, sys.stdout.buffer)
+        sys.stdout.buffer.write(b"\n")
     else:
         report = build_report(results, speed_results if args.speed_test else None)
         print(report)
 
     if args.update:
         update_registry(registry, results)
-        with open(REGISTRY_PATH, "w") as f:
-            json.dump(registry, f, indent=2)
+        with open(REGISTRY_PATH, "wb") as f:
+            _jdump(registry, f)
         print(f"Updated {REGISTRY_PATH}")
 
     if args.codegen:
         # Re-read registry (may have been updated)
-        with open(REGISTRY_PATH) as f:
-            registry = json.load(f)
+        with open(REGISTRY_PATH, "rb") as f:
+            registry = _jload(f)
         patches = generate_codegen(registry)
         print_codegen(patches)
         if args.apply:
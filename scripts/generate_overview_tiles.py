@@ -6,26 +6,54 @@ Fetches WMS tiles at z0-8 (configurable per source), skips transparent tiles,
 and writes to MBTiles for conversion to PMTiles.
 
 Usage:
-    pip install aiohttp Pillow
+    pip install aiohttp Pillow numpy
     python generate_overview_tiles.py [--source usda_cdl] [--all] [--max-zoom 6]
+                                      [--mask landmask.png]
     pmtiles convert <source>.mbtiles <source>.pmtiles
 
+Optional: xxhash (faster tile hashing for dedup and empty-tile detection)
+
 Sources are defined in wms_sources.json.
 """
 
 import asyncio
 import aiohttp
+import hashlib
 import io
 import os
 import sys
 import json
 import time
 import sqlite3
+import struct
 import argparse
+import functools
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from PIL import Image
 
+try:
+    import xxhash
+
+    tile_digest = xxhash.xxh3_128_digest
+except ImportError:
+    def tile_digest(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
 ORIGIN_SHIFT = 20037508.3427892
 TILE_SIZE = 256
+# Servers return byte-identical PNGs for empty tiles; remember this many
+# digests of tiles found transparent so repeats skip the decode
+EMPTY_FINGERPRINTS = 8
+# Initial size of the recycled response buffers (grown for larger tiles)
+TILE_BUFFER_SIZE = 64 * 1024
+PROGRESS_INTERVAL = 0.1  # seconds between progress line refreshes
+_tile_buffers = []  # free list, one buffer per in-flight fetch at most
+# Kept byte-identical so sqlite3's statement cache prepares them only once
+IMAGE_INSERT_SQL = "INSERT INTO images VALUES (?,?)"
+TILE_INSERT_SQL = "INSERT OR REPLACE INTO map VALUES (?,?,?,?)"
 
 # All WMS sources with their configurations
 WMS_SOURCES = {
@@ -287,38 +315,94 @@ WMS_SOURCES = {
 
 
 def lon_to_tile_x(lon, z):
-    return int((lon + 180) / 360 * (2 ** z))
+    return int((lon + 180) / 360 * (1 << z))
 
 
 def lat_to_tile_y(lat, z):
     import math
-    lat_rad = math.radians(lat)
-    n = 2 ** z
-    return int((1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n)
-
-
-def tile_bbox_3857(z, x, y):
-    n = 2 ** z
-    span = 2 * ORIGIN_SHIFT / n
-    x_min = -ORIGIN_SHIFT + x * span
-    x_max = -ORIGIN_SHIFT + (x + 1) * span
-    y_max = ORIGIN_SHIFT - y * span
-    y_min = ORIGIN_SHIFT - (y + 1) * span
-    return x_min, y_min, x_max, y_max
-
+    # log(tan + sec) == asinh(tan): one libm call instead of three
+    return int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * (1 << z))
+
+
+def precompute_bboxes_3857(z, x_min, x_max, y_min, y_max):
+    """EPSG:3857 bboxes for a tile range as an (N, 4) array, rows in y-then-x order."""
+    span = 2 * ORIGIN_SHIFT / (1 << z)
+    xs = np.arange(x_min, x_max + 1)
+    ys = np.arange(y_min, y_max + 1)
+    x_lo, y_lo = np.meshgrid(-ORIGIN_SHIFT + xs * span, ORIGIN_SHIFT - (ys + 1) * span)
+    x_hi, y_hi = np.meshgrid(-ORIGIN_SHIFT + (xs + 1) * span, ORIGIN_SHIFT - ys * span)
+    return np.stack([x_lo, y_lo, x_hi, y_hi], axis=-1).reshape(-1, 4)
+
+
+def precompute_bboxes_4326(z, x_min, x_max, y_min, y_max):
+    """EPSG:4326 bboxes (lon/lat order) for a tile range as an (N, 4) array."""
+    n = 1 << z
+    xs = np.arange(x_min, x_max + 1)
+    ys = np.arange(y_min, y_max + 1)
+    lat_max = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * ys / n))))
+    lat_min = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (ys + 1) / n))))
+    lon_lo, lat_lo = np.meshgrid(xs / n * 360 - 180, lat_min)
+    lon_hi, lat_hi = np.meshgrid((xs + 1) / n * 360 - 180, lat_max)
+    return np.stack([lon_lo, lat_lo, lon_hi, lat_hi], axis=-1).reshape(-1, 4)
+
+
+def load_tile_mask(path):
+    """Load an equirectangular mask PNG (non-zero = fetch) as a summed-area table.
+
+    The image must span -180..180 lon and 90..-90 lat; a 4096x2048 1-bit
+    land mask is plenty for overview zooms.
+    """
+    mask = np.asarray(Image.open(path).convert("L")) > 0
+    sat = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int64)
+    sat[1:, 1:] = mask.cumsum(axis=0).cumsum(axis=1)
+    return sat
+
+
+def tile_mask_level(sat, z, x_min, x_max, y_min, y_max):
+    """True for each tile in the range (y-then-x order) that overlaps the mask."""
+    h, w = sat.shape[0] - 1, sat.shape[1] - 1
+    bboxes = precompute_bboxes_4326(z, x_min, x_max, y_min, y_max)
+    c0 = np.floor((bboxes[:, 0] + 180) / 360 * w).astype(np.intp).clip(0, w)
+    c1 = np.ceil((bboxes[:, 2] + 180) / 360 * w).astype(np.intp).clip(0, w)
+    r0 = np.floor((90 - bboxes[:, 3]) / 180 * h).astype(np.intp).clip(0, h)
+    r1 = np.ceil((90 - bboxes[:, 1]) / 180 * h).astype(np.intp).clip(0, h)
+    # Any set mask pixel inside the tile's extent, in O(1) per tile
+    return (sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0]) > 0
+
+
+def _bboxes_3857(z, x_min, x_max, y_min, y_max):
+    rows = precompute_bboxes_3857(z, x_min, x_max, y_min, y_max).tolist()
+    return [f"{a},{b},{c},{d}" for a, b, c, d in rows]
+
+
+def _bboxes_4326(z, x_min, x_max, y_min, y_max):
+    rows = precompute_bboxes_4326(z, x_min, x_max, y_min, y_max).tolist()
+    return [f"{a},{b},{c},{d}" for a, b, c, d in rows]
+
+
+def _bboxes_4326_latlon(z, x_min, x_max, y_min, y_max):
+    # WMS 1.3.0 uses lat/lon axis order for EPSG:4326
+    rows = precompute_bboxes_4326(z, x_min, x_max, y_min, y_max).tolist()
+    return [f"{b},{a},{d},{c}" for a, b, c, d in rows]
+
+
+# (WMS version, CRS) -> BBOX formatter with the axis order baked in, chosen
+# once per source instead of branching per tile
+_BBOX_BUILDERS = {
+    ("1.1.1", "EPSG:3857"): _bboxes_3857,
+    ("1.3.0", "EPSG:3857"): _bboxes_3857,
+    ("1.1.1", "EPSG:4326"): _bboxes_4326,
+    ("1.3.0", "EPSG:4326"): _bboxes_4326_latlon,
+}
 
-def tile_bbox_4326(z, x, y):
-    import math
-    n = 2 ** z
-    lon_min = x / n * 360 - 180
-    lon_max = (x + 1) / n * 360 - 180
-    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
-    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
-    return lon_min, lat_min, lon_max, lat_max
 
+def _make_url_template(source, year=None):
+    """Resolve everything in a source's GetMap URL except the BBOX.
 
-def build_wms_url(source, z, x, y, year=None):
-    """Construct WMS GetMap URL for a tile."""
+    Returns (template, bboxes_fn): template has a single %s at the BBOX slot,
+    and bboxes_fn(z, x_min, x_max, y_min, y_max) formats the BBOX of every
+    tile in the range (y-then-x order) in the source's CRS and axis order.
+    """
     src = WMS_SOURCES[source]
     crs = src.get("crs", "EPSG:3857")
     version = src.get("wms_version", "1.1.1")
@@ -330,41 +414,72 @@ def build_wms_url(source, z, x, y, year=None):
         base_url = base_url.replace("{year}", str(year))
         layers = layers.replace("{year}", str(year))
 
-    if crs == "EPSG:4326":
-        lon_min, lat_min, lon_max, lat_max = tile_bbox_4326(z, x, y)
-        if version == "1.3.0":
-            bbox = f"{lat_min},{lon_min},{lat_max},{lon_max}"
-        else:
-            bbox = f"{lon_min},{lat_min},{lon_max},{lat_max}"
-    else:
-        x_min, y_min, x_max, y_max = tile_bbox_3857(z, x, y)
-        bbox = f"{x_min},{y_min},{x_max},{y_max}"
+    bboxes_fn = _BBOX_BUILDERS.get((version, crs))
+    if bboxes_fn is None:
+        raise ValueError(f"{source}: unsupported WMS {version} / {crs} combination")
 
     srs_param = "CRS" if version == "1.3.0" else "SRS"
-    url = (
+    head = (
         f"{base_url}?SERVICE=WMS&VERSION={version}&REQUEST=GetMap"
-        f"&LAYERS={layers}&{srs_param}={crs}&BBOX={bbox}"
-        f"&WIDTH={TILE_SIZE}&HEIGHT={TILE_SIZE}&FORMAT=image/png&TRANSPARENT=TRUE&STYLES="
+        f"&LAYERS={layers}&{srs_param}={crs}&BBOX="
     )
+    tail = f"&WIDTH={TILE_SIZE}&HEIGHT={TILE_SIZE}&FORMAT=image/png&TRANSPARENT=TRUE&STYLES="
     extra = src.get("extra_params", "")
     if extra:
-        url += f"&{extra}"
-    return url
-
-
-def flip_y(z, y):
-    return (2 ** z) - 1 - y
+        tail += f"&{extra}"
+    # Escape any literal % (e.g. percent-encoded params) around the slot
+    return head.replace("%", "%%") + "%s" + tail.replace("%", "%%"), bboxes_fn
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_alpha_hint(data):
+    """Decide transparency from PNG chunk headers alone, without inflating.
+
+    Returns True (fully transparent), False (has visible pixels), or None
+    when the pixels must be decoded to tell.
+    """
+    if data[:8] != PNG_SIGNATURE or data[12:16] != b"IHDR":
+        return None
+    color_type = data[25]
+    palette_size = 0
+    pos = 8
+    while pos + 8 <= len(data):
+        length, chunk = struct.unpack_from(">I4s", data, pos)
+        if chunk == b"PLTE":
+            palette_size = length // 3
+        elif chunk == b"tRNS":
+            if color_type != 3:
+                return None  # colour-key transparency: decode
+            alphas = data[pos + 8:pos + 8 + length]
+            if alphas and min(alphas) > 0:
+                return False
+            # Entries past the end of tRNS are opaque
+            if alphas and len(alphas) >= palette_size and max(alphas) == 0:
+                return True
+            return None
+        elif chunk == b"IDAT":
+            break
+        pos += length + 12
+    # No tRNS before the image data: grey/RGB/palette tiles are opaque
+    return False if color_type in (0, 2, 3) else None
 
 
 def is_transparent(data):
     """Check if a PNG tile is fully transparent."""
+    hint = _png_alpha_hint(data)
+    if hint is not None:
+        return hint
     try:
-        img = Image.open(io.BytesIO(data)).convert("RGBA")
-        # Sample pixels — if all alpha=0, skip
-        pixels = img.getdata()
-        # Check a sample of pixels
-        sample = list(pixels)[::max(1, len(pixels) // 100)]
-        return all(p[3] == 0 for p in sample)
+        with Image.open(io.BytesIO(data)) as img:
+            if img.mode in ("RGB", "L", "P") and "transparency" not in img.info:
+                return False
+            if img.mode not in ("RGBA", "LA"):
+                img = img.convert("RGBA")
+            # getbbox on the alpha band is None when every pixel is clear;
+            # it scans in C and stops at the first visible pixel
+            return img.getchannel("A").getbbox() is None
     except Exception:
         return True
 
@@ -372,16 +487,30 @@ def is_transparent(data):
 def init_mbtiles(path, name, description=""):
     if os.path.exists(path):
         os.remove(path)
-    db = sqlite3.connect(path)
+    # Tile batches are written from a worker thread (see tile_writer)
+    db = sqlite3.connect(path, check_same_thread=False)
+    # Bulk-load settings: WAL with NORMAL sync avoids an fsync per commit
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA cache_size=-65536")
+    db.execute("PRAGMA temp_store=MEMORY")
     db.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    # Deduplicated layout: each distinct PNG is stored once in images, and
+    # the standard tiles view joins it back for readers
+    db.execute("CREATE TABLE images (tile_id INTEGER PRIMARY KEY, tile_data BLOB)")
     db.execute(
-        "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, "
-        "tile_row INTEGER, tile_data BLOB)"
+        "CREATE TABLE map (zoom_level INTEGER, tile_column INTEGER, "
+        "tile_row INTEGER, tile_id INTEGER)"
     )
     db.execute(
-        "CREATE UNIQUE INDEX tile_index ON tiles "
+        "CREATE UNIQUE INDEX map_index ON map "
         "(zoom_level, tile_column, tile_row)"
     )
+    db.execute(
+        "CREATE VIEW tiles AS SELECT map.zoom_level AS zoom_level, "
+        "map.tile_column AS tile_column, map.tile_row AS tile_row, "
+        "images.tile_data AS tile_data FROM map JOIN images USING (tile_id)"
+    )
     for k, v in {"name": name, "format": "png", "type": "overlay",
                   "description": description}.items():
         db.execute("INSERT INTO metadata VALUES (?, ?)", (k, v))
@@ -389,26 +518,129 @@ def init_mbtiles(path, name, description=""):
     return db
 
 
-async def fetch_tile(session, url, semaphore, retries=2):
+async def fetch_tile(session, url, buf, retries=2):
+    """Stream a tile body into buf (grown if needed); return its length, 0 on failure."""
     for attempt in range(retries + 1):
+        try:
+            async with session.get(
+                url, timeout=aiohttp.ClientTimeout(total=30)
+            ) as resp:
+                if resp.status == 200:
+                    n = 0
+                    async for chunk in resp.content.iter_any():
+                        end = n + len(chunk)
+                        buf[n:end] = chunk  # in-place copy while within capacity
+                        n = end
+                    if n > 100:
+                        return n
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt < retries:
+                await asyncio.sleep(1)
+    return 0
+
+
+async def fetch_and_classify(session, url, semaphore, pool, empty_fingerprints):
+    """Fetch a tile and decide whether it has any visible pixels.
+
+    Returns (data, digest, hit): data is None for failed or empty tiles,
+    digest is tile_digest of the body, and hit is True when an empty tile
+    was recognised by its digest alone. `semaphore`
+    bounds in-flight requests (shared across sources by generate_all).
+    Tiles the PNG headers settle are classified in place; the rest are
+    decoded in `pool` so they overlap the event loop's network I/O.
+    """
+    # Bodies land in a recycled buffer; a bytes copy is only made for tiles
+    # that have to be decoded or stored
+    buf = _tile_buffers.pop() if _tile_buffers else bytearray(TILE_BUFFER_SIZE)
+    try:
         async with semaphore:
-            try:
-                async with session.get(
-                    url, timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.read()
-                        if len(data) > 100:
-                            return data
-            except (aiohttp.ClientError, asyncio.TimeoutError):
-                if attempt < retries:
-                    await asyncio.sleep(1)
-    return None
+            n = await fetch_tile(session, url, buf)
+        if not n:
+            return None, None, False
+        with memoryview(buf)[:n] as body:
+            digest = tile_digest(body)
+            if digest in empty_fingerprints:
+                empty_fingerprints.move_to_end(digest)
+                return None, digest, True
+            data = bytes(body)
+    finally:
+        _tile_buffers.append(buf)
+
+    transparent = _png_alpha_hint(data)
+    if transparent is None:
+        loop = asyncio.get_running_loop()
+        transparent = await loop.run_in_executor(pool, is_transparent, data)
+    if transparent:
+        empty_fingerprints[digest] = None
+        if len(empty_fingerprints) > EMPTY_FINGERPRINTS:
+            empty_fingerprints.popitem(last=False)
+        return None, digest, False
+    return data, digest, False
+
+
+def _write_batch(db, images, tiles):
+    db.executemany(IMAGE_INSERT_SQL, images)
+    db.executemany(TILE_INSERT_SQL, tiles)
+
+
+async def tile_writer(db, queue):
+    """Insert (images, tiles) row batches from queue until a None sentinel.
+
+    The inserts run in a worker thread, so they never stall fetches.
+    """
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            return
+        await asyncio.to_thread(_write_batch, db, *batch)
+
+
+async def _drain(tiles, start, limit):
+    """Run start(item) for each (key, item) in tiles with up to `limit` in flight.
+
+    Yields (key, result) as each task completes and starts the next one
+    straight away, so a slow tile never holds back the ones behind it.
+    """
+    tiles = iter(tiles)  # each refill resumes where the last one stopped
+    pending = {}
+    while True:
+        for key, item in tiles:
+            pending[asyncio.create_task(start(item))] = key
+            if len(pending) >= limit:
+                break
+        if not pending:
+            return
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield pending.pop(task), task.result()
 
 
 async def generate_source(source_id, max_zoom_override=None, year_override=None,
-                           output_dir="pmtiles", concurrency=8):
-    """Generate overview tiles for a single source."""
+                           output_dir="pmtiles", concurrency=8, session=None, pool=None,
+                           mask=None, global_sem=None):
+    """Generate overview tiles for a single source.
+
+    Pass `session` and `pool` (a ProcessPoolExecutor for PNG decodes) to share
+    them across sources; otherwise they are opened for this call. `global_sem`
+    caps requests across concurrently running sources. `mask` is a
+    load_tile_mask table; tiles that miss it are skipped without a request.
+    """
+    if pool is None:
+        with ProcessPoolExecutor() as pool:
+            return await generate_source(
+                source_id, max_zoom_override, year_override, output_dir, concurrency,
+                session=session, pool=pool, mask=mask, global_sem=global_sem,
+            )
+    if session is None:
+        connector = aiohttp.TCPConnector(limit=concurrency * 2)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await generate_source(
+                source_id, max_zoom_override, year_override, output_dir, concurrency,
+                session=session, pool=pool, mask=mask, global_sem=global_sem,
+            )
+    if global_sem is None:
+        global_sem = asyncio.Semaphore(concurrency)
+
     src = WMS_SOURCES[source_id]
     name = src["name"]
     max_zoom = max_zoom_override or src.get("max_zoom", 6)
@@ -429,89 +661,143 @@ async def generate_source(source_id, max_zoom_override=None, year_override=None,
         print(f"{'='*60}")
 
         db = init_mbtiles(mbtiles_path, f"{name}{suffix}", desc)
-        semaphore = asyncio.Semaphore(concurrency)
-        connector = aiohttp.TCPConnector(limit=concurrency * 2)
 
         saved = 0
         skipped = 0
-        t0 = time.time()
+        fingerprint_hits = 0
+        empty_fingerprints = OrderedDict()
+        tile_ids = {}  # digest -> images.tile_id
+        images = []
+        inserts = []
+        queue = asyncio.Queue(maxsize=8)
+        writer = asyncio.create_task(tile_writer(db, queue))
+        try:
+            t0 = time.time()
+            last_progress = 0.0
+
+            # Only the BBOX changes from tile to tile
+            template, bboxes_fn = _make_url_template(source_id, yr)
+
+            def fetch(bbox):
+                return fetch_and_classify(
+                    session, template % bbox, global_sem, pool, empty_fingerprints
+                )
 
-        async with aiohttp.ClientSession(connector=connector) as session:
             for z in range(0, max_zoom + 1):
                 # Compute tile range for bounds at this zoom
                 x_min = max(0, lon_to_tile_x(bounds[0], z))
-                x_max = min(2**z - 1, lon_to_tile_x(bounds[2], z))
+                x_max = min((1 << z) - 1, lon_to_tile_x(bounds[2], z))
                 y_min = max(0, lat_to_tile_y(bounds[3], z))  # Note: y is inverted
-                y_max = min(2**z - 1, lat_to_tile_y(bounds[1], z))
+                y_max = min((1 << z) - 1, lat_to_tile_y(bounds[1], z))
 
                 level_total = (x_max - x_min + 1) * (y_max - y_min + 1)
-                print(f"\n  z{z}: {level_total} tiles (x={x_min}-{x_max}, y={y_min}-{y_max})")
-
-                batch = []
-                for yy in range(y_min, y_max + 1):
-                    for xx in range(x_min, x_max + 1):
-                        url = build_wms_url(source_id, z, xx, yy, year=yr)
-                        batch.append((z, xx, yy, url))
-
-                        if len(batch) >= 32:
-                            results = await asyncio.gather(
-                                *[fetch_tile(session, b[3], semaphore) for b in batch]
-                            )
-                            for (bz, bx, by, _), data in zip(batch, results):
-                                if data and not is_transparent(data):
-                                    tms_y = flip_y(bz, by)
-                                    db.execute(
-                                        "INSERT OR REPLACE INTO tiles VALUES (?,?,?,?)",
-                                        (bz, bx, tms_y, data),
-                                    )
-                                    saved += 1
-                                else:
-                                    skipped += 1
-
-                            elapsed = time.time() - t0
-                            rate = (saved + skipped) / max(elapsed, 0.1)
-                            print(f"    saved={saved} skipped={skipped} ({rate:.1f}/s)", end="\r")
-                            batch = []
-
-                if batch:
-                    results = await asyncio.gather(
-                        *[fetch_tile(session, b[3], semaphore) for b in batch]
-                    )
-                    for (bz, bx, by, _), data in zip(batch, results):
-                        if data and not is_transparent(data):
-                            tms_y = flip_y(bz, by)
-                            db.execute(
-                                "INSERT OR REPLACE INTO tiles VALUES (?,?,?,?)",
-                                (bz, bx, tms_y, data),
-                            )
-                            saved += 1
-                        else:
-                            skipped += 1
-
-                db.commit()
-
-        db.execute("INSERT OR REPLACE INTO metadata VALUES ('minzoom', '0')")
-        db.execute("INSERT OR REPLACE INTO metadata VALUES ('maxzoom', ?)", (str(max_zoom),))
-        db.execute("INSERT OR REPLACE INTO metadata VALUES ('bounds', ?)",
-                   (f"{bounds[0]},{bounds[1]},{bounds[2]},{bounds[3]}",))
-        db.commit()
-        db.close()
+                y_flip = (1 << z) - 1  # XYZ -> TMS row: y_flip - y
+                print(f"\n  [{source_id}] z{z}: {level_total} tiles "
+                      f"(x={x_min}-{x_max}, y={y_min}-{y_max})")
+
+                tiles = zip(
+                    ((xx, yy) for yy in range(y_min, y_max + 1)
+                     for xx in range(x_min, x_max + 1)),
+                    bboxes_fn(z, x_min, x_max, y_min, y_max),
+                )
+                if mask is not None:
+                    keep = tile_mask_level(mask, z, x_min, x_max, y_min, y_max)
+                    masked = len(keep) - int(keep.sum())
+                    skipped += masked
+                    print(f"    [{source_id}] {masked} tiles outside mask")
+                    tiles = itertools.compress(tiles, keep.tolist())
+                since_flush = 0
+                async for (xx, yy), (data, digest, hit) in _drain(tiles, fetch, concurrency):
+                    if data:
+                        tile_id = tile_ids.get(digest)
+                        if tile_id is None:
+                            tile_id = tile_ids[digest] = len(tile_ids) + 1
+                            images.append((tile_id, data))
+                        inserts.append((z, xx, y_flip - yy, tile_id))
+                        saved += 1
+                    else:
+                        fingerprint_hits += hit
+                        skipped += 1
+
+                    since_flush += 1
+                    if since_flush >= 32:
+                        await queue.put((images, inserts))
+                        images, inserts = [], []
+                        since_flush = 0
+
+                    # Progress at most every PROGRESS_INTERVAL, not once per batch
+                    now = time.monotonic()
+                    if now - last_progress >= PROGRESS_INTERVAL:
+                        last_progress = now
+                        rate = (saved + skipped) / max(time.time() - t0, 0.1)
+                        sys.stdout.write(f"    [{source_id}] saved={saved} skipped={skipped} "
+                                         f"(empty-hash={fingerprint_hits}) ({rate:.1f}/s)\r")
+                        sys.stdout.flush()
+
+            await queue.put((images, inserts))
+            await queue.put(None)
+            await writer
+
+            # Single commit for every tile plus the metadata
+            db.execute("INSERT OR REPLACE INTO metadata VALUES ('minzoom', '0')")
+            db.execute("INSERT OR REPLACE INTO metadata VALUES ('maxzoom', ?)", (str(max_zoom),))
+            db.execute("INSERT OR REPLACE INTO metadata VALUES ('bounds', ?)",
+                       (f"{bounds[0]},{bounds[1]},{bounds[2]},{bounds[3]}",))
+            db.commit()
+            # Leave a single self-contained file for pmtiles convert
+            db.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            # On failure, still stop the writer before closing under it
+            if not writer.done():
+                await queue.put(None)
+                await asyncio.gather(writer, return_exceptions=True)
+            db.close()
 
         elapsed = time.time() - t0
         size_mb = os.path.getsize(mbtiles_path) / (1024 * 1024)
-        print(f"\n  Done: {saved} tiles, {size_mb:.1f}MB in {elapsed:.0f}s")
+        print(f"\n  [{source_id}] Done: {saved} tiles ({len(tile_ids)} unique), "
+              f"{size_mb:.1f}MB in {elapsed:.0f}s "
+              f"({fingerprint_hits} empty tiles matched by hash)")
         print(f"  Convert: pmtiles convert {mbtiles_path} {mbtiles_path.replace('.mbtiles', '.pmtiles')}")
 
 
-async def generate_all(max_zoom_override=None, output_dir="pmtiles", concurrency=6):
-    """Generate overview tiles for ALL sources."""
-    for source_id in WMS_SOURCES:
-        try:
-            await generate_source(source_id, max_zoom_override=max_zoom_override,
-                                   output_dir=output_dir, concurrency=concurrency)
-        except Exception as e:
-            print(f"\n  ERROR generating {source_id}: {e}")
-            continue
+async def generate_all(max_zoom_override=None, output_dir="pmtiles", concurrency=6,
+                       mask=None):
+    """Generate overview tiles for ALL sources.
+
+    Sources run concurrently, so a slow server no longer holds up the rest;
+    one semaphore caps the total number of requests in flight.
+    """
+    # One pool for every source: several sources share a host, so their
+    # keep-alive connections and cached DNS lookups carry over
+    connector = aiohttp.TCPConnector(
+        limit=concurrency * 4, limit_per_host=concurrency, ttl_dns_cache=600
+    )
+    global_sem = asyncio.Semaphore(concurrency * 4)
+    with ProcessPoolExecutor() as pool:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            outcomes = await asyncio.gather(
+                *[generate_source(source_id, max_zoom_override=max_zoom_override,
+                                  output_dir=output_dir, concurrency=concurrency,
+                                  session=session, pool=pool, mask=mask,
+                                  global_sem=global_sem)
+                  for source_id in WMS_SOURCES],
+                return_exceptions=True,
+            )
+    for source_id, outcome in zip(WMS_SOURCES, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"\n  ERROR generating {source_id}: {outcome}")
+
+
+@functools.cache
+def _sources_listing():
+    """Formatted --list output, built once per process."""
+    lines = ["Available sources:"]
+    for sid, src in sorted(WMS_SOURCES.items()):
+        years = src.get("years", [])
+        yr_str = f" ({years[0]}-{years[-1]})" if years else ""
+        lines.append(f"  {sid:25s} {src['name']}{yr_str}  z0-{src.get('max_zoom', 6)}")
+    return "\n".join(lines)
 
 
 def main():
@@ -523,25 +809,26 @@ def main():
     parser.add_argument("--year", type=int, help="Override year")
     parser.add_argument("--output-dir", default="pmtiles")
     parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--mask", help="Equirectangular PNG (non-zero = fetch), "
+                                       "e.g. a land mask; tiles outside it are skipped")
     args = parser.parse_args()
 
     if args.list:
-        print("Available sources:")
-        for sid, src in sorted(WMS_SOURCES.items()):
-            years = src.get("years", [])
-            yr_str = f" ({years[0]}-{years[-1]})" if years else ""
-            print(f"  {sid:25s} {src['name']}{yr_str}  z0-{src.get('max_zoom', 6)}")
+        print(_sources_listing())
         return
 
+    mask = load_tile_mask(args.mask) if args.mask else None
+
     if args.all:
-        asyncio.run(generate_all(args.max_zoom, args.output_dir, args.concurrency))
+        asyncio.run(generate_all(args.max_zoom, args.output_dir, args.concurrency, mask))
     elif args.source:
         if args.source not in WMS_SOURCES:
             print(f"Unknown source: {args.source}")
             print(f"Available: {', '.join(sorted(WMS_SOURCES.keys()))}")
             sys.exit(1)
         asyncio.run(generate_source(
-            args.source, args.max_zoom, args.year, args.output_dir, args.concurrency
+            args.source, args.max_zoom, args.year, args.output_dir, args.concurrency,
+            mask=mask,
         ))
     else:
         parser.print_help()
@@ -7,21 +7,53 @@ from Terrascope WMS, combines into a single classified raster, and saves as
 MBTiles (which can be converted to PMTiles via `pmtiles convert`).
 
 Usage:
-    pip install aiohttp Pillow
+    pip install aiohttp Pillow numpy
     python generate_worldcereal_croptype.py [--min-zoom 0] [--max-zoom 6]
+                                            [--cache-dir wms_cache]
+                                            [--coverage coverage_z5.bin]
     pmtiles convert worldcereal_croptype.mbtiles worldcereal_croptype.pmtiles
+
+Optional: pillow-simd in place of Pillow (SIMD PNG decode, the main CPU cost
+per tile; install with `pip uninstall Pillow && pip install pillow-simd`)
+Optional: numba (fused, compiled combine kernel)
+Optional: uvloop >= 0.18 (faster event loop for the per-tile fetch tasks)
+Optional: xxhash (faster hashing of layer responses for empty-tile detection)
 """
 
 import asyncio
 import aiohttp
+import hashlib
 import io
 import os
 import sys
+import random
 import time
 import sqlite3
 import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 from PIL import Image
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import xxhash
+
+    tile_digest = xxhash.xxh3_128_digest
+except ImportError:
+    def tile_digest(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
 # WorldCereal WMS layers on Terrascope
 WMS_BASE = "https://services.terrascope.be/wms/v2"
 
@@ -52,9 +84,33 @@ LAYERS = [
     },
 ]
 
+LAYERS_BY_PRIORITY = tuple(sorted(LAYERS, key=lambda l: l["priority"]))
+
+# Output tiles are palette PNGs: index 0 is transparent, index i is
+# LAYERS_BY_PRIORITY[i - 1]
+PALETTE = [0, 0, 0] + [c for layer in LAYERS_BY_PRIORITY for c in layer["color"][:3]]
+
 ORIGIN_SHIFT = 20037508.3427892
 TILE_SIZE = 256
 ALPHA_THRESHOLD = 30  # Minimum alpha to count as "crop present"
+WRITE_BATCH = 500     # Tile rows per writer transaction
+GREEDY_COVERAGE = 0.99  # --greedy: stop fetching once this share is claimed
+RETRY_MAX_DELAY = 30  # Cap in seconds on one retry wait
+COVERAGE_ZOOM = 5     # Grid of the --coverage bitmap (32x32 tiles, 128 bytes)
+# Terrascope returns byte-identical PNGs for empty layer tiles; remember this
+# many digests of responses that added nothing so repeats skip the decode
+EMPTY_FINGERPRINTS = 8
+_empty_digests = OrderedDict()
+
+# SWAR alpha test, eight pixels per uint64 word: for each byte b,
+# (((b & 0x7F) + (0x7F - ALPHA_THRESHOLD)) | b) & 0x80 is set exactly when
+# b > ALPHA_THRESHOLD, and the sum never carries into the next byte
+_LANES = 0x0101010101010101
+_SWAR_LOW7 = np.uint64(0x7F * _LANES)
+_SWAR_BIAS = np.uint64((0x7F - ALPHA_THRESHOLD) * _LANES)
+_SWAR_HIGH = np.uint64(0x80 * _LANES)
+_SWAR_SHIFT = np.uint64(7)
+_SWAR_BYTE = np.uint64(0xFF)
 
 
 def tile_bbox_3857(z, x, y):
@@ -83,33 +139,132 @@ def flip_y(z, y):
     return (2 ** z) - 1 - y
 
 
-def combine_tiles(layer_images):
+def load_coverage(path):
+    """Load a bit-packed COVERAGE_ZOOM tile bitmap, [y, x], set = has crops."""
+    n = 1 << COVERAGE_ZOOM
+    bits = np.unpackbits(np.fromfile(path, np.uint8))
+    if bits.size != n * n:
+        raise ValueError(f"{path}: expected {n * n // 8} bytes for a z{COVERAGE_ZOOM} bitmap")
+    return bits.reshape(n, n).astype(bool)
+
+
+def coverage_level(coverage, z):
+    """(2**z, 2**z) bool array, [y, x], of tiles overlapping the coverage bitmap."""
+    shift = COVERAGE_ZOOM - z
+    if shift >= 0:
+        # A coarse tile is covered if any of its COVERAGE_ZOOM descendants is
+        n, k = 1 << z, 1 << shift
+        return coverage.reshape(n, k, n, k).any(axis=(1, 3))
+    k = 1 << -shift
+    return coverage.repeat(k, axis=0).repeat(k, axis=1)
+
+
+def write_coverage(db, path):
+    """Save the coverage bitmap of the z >= COVERAGE_ZOOM tiles stored in db."""
+    n = 1 << COVERAGE_ZOOM
+    coverage = np.zeros((n, n), bool)
+    for z, x, tms_y in db.execute(
+        "SELECT zoom_level, tile_column, tile_row FROM tiles WHERE zoom_level >= ?",
+        (COVERAGE_ZOOM,),
+    ):
+        shift = z - COVERAGE_ZOOM
+        coverage[flip_y(z, tms_y) >> shift, x >> shift] = True
+    np.packbits(coverage).tofile(path)
+    return int(coverage.sum())
+
+
+def alpha_band(data):
+    """Decode a layer PNG to its alpha band as a 2-D uint8 array."""
+    img = Image.open(io.BytesIO(data))
+    if img.mode not in ("RGBA", "LA"):
+        # Palette/grey tiles carry transparency in tRNS; let PIL resolve it
+        img = img.convert("RGBA")
+    return np.asarray(img.getchannel("A"))
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _combine_swar(alphas, fills, out):
+        """Classify every pixel in one pass over uint64 words.
+
+        alphas holds each layer's alpha band (highest priority first) and
+        fills its class index repeated in every byte; each output byte takes
+        the first layer over ALPHA_THRESHOLD, without per-pixel branches.
+        """
+        for i in range(out.size):
+            word = np.uint64(0)
+            claimed = np.uint64(0)
+            for k in range(len(alphas)):
+                q = alphas[k][i]
+                hit = (((q & _SWAR_LOW7) + _SWAR_BIAS) | q) & _SWAR_HIGH
+                m = (hit >> _SWAR_SHIFT) * _SWAR_BYTE  # 0xFF in each set byte
+                word |= fills[k] & m & ~claimed
+                claimed |= m
+            out[i] = word
+else:
+    _combine_swar = None
+
+
+def _swar_words(alpha):
+    """Read-only uint64 view of an alpha band, as _combine_swar expects."""
+    words = np.ascontiguousarray(alpha).reshape(-1).view(np.uint64)
+    words.flags.writeable = False
+    return words
+
+
+_NO_LAYER = _swar_words(np.zeros((TILE_SIZE, TILE_SIZE), np.uint8))
+_SWAR_FILLS = np.array(
+    [idx * _LANES for idx in range(1, len(LAYERS_BY_PRIORITY) + 1)], np.uint64
+)
+
+
+_scratch = threading.local()
+
+
+def _scratch_buffers():
+    """This thread's class-index array and PNG buffer, reused across tiles."""
+    if not hasattr(_scratch, "out"):
+        _scratch.out = np.empty((TILE_SIZE, TILE_SIZE), np.uint8)
+        _scratch.bio = io.BytesIO()
+    return _scratch.out, _scratch.bio
+
+
+def combine_tiles(alphas):
     """
-    Combine 4 binary crop-type tiles into a single classified tile.
+    Combine 4 binary crop-type alpha masks into a single classified tile.
     Priority: maize > winter cereals > spring cereals > other crops.
     Returns PNG bytes or None if all-transparent.
     """
-    output = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-    out_px = output.load()
-    has_data = False
-
-    for py in range(TILE_SIZE):
-        for px in range(TILE_SIZE):
-            for layer in sorted(LAYERS, key=lambda l: l["priority"]):
-                img = layer_images.get(layer["id"])
-                if img is None:
-                    continue
-                r, g, b, a = img.getpixel((px, py))
-                if a > ALPHA_THRESHOLD:
-                    out_px[px, py] = layer["color"]
-                    has_data = True
-                    break
-
-    if not has_data:
-        return None
-
-    buf = io.BytesIO()
-    output.save(buf, "PNG", optimize=True)
+    out, buf = _scratch_buffers()
+
+    if _combine_swar is not None and all(a.shape == out.shape for a in alphas.values()):
+        words = tuple(
+            _swar_words(alphas[layer["id"]]) if layer["id"] in alphas else _NO_LAYER
+            for layer in LAYERS_BY_PRIORITY
+        )
+        _combine_swar(words, _SWAR_FILLS, out.reshape(-1).view(np.uint64))
+        if not out.any():
+            return None
+    else:
+        # Threshold each layer once; if nothing is claimed, skip painting
+        # the class array as well as the encode
+        hits = {lid: alpha > ALPHA_THRESHOLD for lid, alpha in alphas.items()}
+        if not any(hit.any() for hit in hits.values()):
+            return None
+        out.fill(0)
+        # Lowest priority first, so higher-priority classes simply overwrite
+        for idx in range(len(LAYERS_BY_PRIORITY), 0, -1):
+            hit = hits.get(LAYERS_BY_PRIORITY[idx - 1]["id"])
+            if hit is not None:
+                out[hit] = idx
+
+    # One byte per pixel and a fixed palette; optimize=True's zlib search
+    # buys little on five-colour tiles
+    img = Image.fromarray(out, "P")
+    img.putpalette(PALETTE)
+    buf.seek(0)
+    buf.truncate()
+    img.save(buf, "PNG", transparency=0, compress_level=6)
     return buf.getvalue()
 
 
@@ -117,16 +272,25 @@ def init_mbtiles(path):
     """Create MBTiles database with metadata."""
     if os.path.exists(path):
         os.remove(path)
-    db = sqlite3.connect(path)
+    # Autocommit mode: bulk writes are wrapped in explicit BEGIN/COMMIT.
+    # Tile rows are written from a worker thread (see tile_writer).
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    # The file is a regenerable artifact, so trade durability for ingest
+    # speed: no rollback journal, no fsync, one exclusive writer.
+    # page_size must be set before the first table is created.
+    db.execute("PRAGMA page_size=65536")
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute("PRAGMA locking_mode=EXCLUSIVE")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-65536")
+    db.execute("BEGIN")
     db.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
     db.execute(
         "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, "
         "tile_row INTEGER, tile_data BLOB)"
     )
-    db.execute(
-        "CREATE UNIQUE INDEX tile_index ON tiles "
-        "(zoom_level, tile_column, tile_row)"
-    )
+    # tile_index is built by generate() once every row is loaded
     metadata = {
         "name": "WorldCereal Crop Type 2021",
         "format": "png",
@@ -143,88 +307,305 @@ def init_mbtiles(path):
     return db
 
 
-async def fetch_tile(session, url, semaphore, retries=2):
-    """Fetch a single WMS tile with retries."""
+class TileCache:
+    """The raw WMS response cache kept in cache_dir/wms_tiles.db.
+
+    All SQLite calls run on one dedicated worker thread: the connection
+    is never used from two threads at once and lookups don't block the
+    event loop.
+    """
+
+    def __init__(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._io = ThreadPoolExecutor(max_workers=1)
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "wms_tiles.db"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (layer TEXT, z INTEGER, x INTEGER, "
+            "y INTEGER, png BLOB, PRIMARY KEY (layer, z, x, y))"
+        )
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    def _get(self, key):
+        row = self._db.execute(
+            "SELECT png FROM cache WHERE layer=? AND z=? AND x=? AND y=?", key
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def _put(self, key, data):
+        self._db.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?,?)", (*key, data))
+
+    async def get(self, key):
+        return await self._run(self._get, key)
+
+    async def put(self, key, data):
+        await self._run(self._put, key, data)
+
+    async def commit(self):
+        await self._run(self._db.commit)
+
+    def close(self):
+        """Commit what is pending and close; safe to call after a failure."""
+        self._io.shutdown(wait=True)
+        self._db.commit()
+        self._db.close()
+
+
+def _write_rows(db, rows):
+    db.execute("BEGIN")
+    # Each (z, x, y) is produced exactly once, so no OR REPLACE
+    db.executemany("INSERT INTO tiles VALUES (?,?,?,?)", rows)
+    db.commit()
+
+
+async def tile_writer(db, queue):
+    """Insert lists of tile rows from queue until a None sentinel.
+
+    Rows are committed WRITE_BATCH at a time from a worker thread, so
+    SQLite never stalls the fetches running on the event loop.
+    """
+    rows = []
+    while True:
+        batch = await queue.get()
+        if batch is not None:
+            rows.extend(batch)
+        if rows and (batch is None or len(rows) >= WRITE_BATCH):
+            await asyncio.to_thread(_write_rows, db, rows)
+            rows = []
+        if batch is None:
+            return
+
+
+def _retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number attempt + 1.
+
+    Honours a delta-seconds Retry-After; otherwise backs off exponentially
+    with jitter so throttled requests don't all come back at once.
+    """
+    if retry_after is not None and retry_after.strip().isdigit():
+        return min(RETRY_MAX_DELAY, int(retry_after))
+    return min(RETRY_MAX_DELAY, 0.5 * 2 ** attempt) + random.uniform(0, 0.5)
+
+
+async def fetch_tile(session, url, semaphore, retries=4):
+    """Fetch a single WMS tile with retries; returns a bytearray or None.
+
+    Timeouts, connection errors, 429 and 5xx responses are retried; other
+    client errors and tiny error bodies are not.
+    """
     for attempt in range(retries + 1):
+        retry_after = None
         async with semaphore:
             try:
                 async with session.get(
                     url, timeout=aiohttp.ClientTimeout(total=30)
                 ) as resp:
                     if resp.status == 200:
-                        data = await resp.read()
-                        if len(data) > 100:  # Skip tiny error responses
-                            return data
+                        # Size the body from Content-Length so chunks are
+                        # copied in place rather than joined at the end
+                        data = bytearray(resp.content_length or 0)
+                        n = 0
+                        async for chunk in resp.content.iter_any():
+                            end = n + len(chunk)
+                            data[n:end] = chunk
+                            n = end
+                        del data[n:]
+                        # Tiny bodies are service exceptions, not tiles
+                        return data if n > 100 else None
+                    if resp.status == 429:
+                        retry_after = resp.headers.get("Retry-After")
+                    elif resp.status < 500:
+                        return None
             except (aiohttp.ClientError, asyncio.TimeoutError):
-                if attempt < retries:
-                    await asyncio.sleep(1)
+                pass
+        # Back off outside the semaphore so waiting doesn't hold a slot
+        if attempt < retries:
+            await asyncio.sleep(_retry_delay(attempt, retry_after))
     return None
 
 
-async def process_tile(session, semaphore, z, x, y):
-    """Fetch all layers for one tile and combine."""
+def _layer_alpha(data):
+    """alpha_band(data), or None for a missing or undecodable response."""
+    if not data:
+        return None
+    try:
+        return alpha_band(data)
+    except Exception:
+        return None
+
+
+def _known_empty(digest):
+    if digest in _empty_digests:
+        _empty_digests.move_to_end(digest)
+        return True
+    return False
+
+
+def _remember_empty(digest):
+    _empty_digests[digest] = None
+    if len(_empty_digests) > EMPTY_FINGERPRINTS:
+        _empty_digests.popitem(last=False)
+
+
+def combine_responses(responses):
+    """Decode {layer id: PNG body} and combine; runs in the worker pool.
+
+    Returns (png, empty): png as combine_tiles, and the ids of layers whose
+    response claimed no pixels, so the caller can fingerprint them.
+    """
+    alphas = {}
+    empty = []
+    for lid, data in responses.items():
+        alpha = _layer_alpha(data)
+        if alpha is None or not (alpha > ALPHA_THRESHOLD).any():
+            empty.append(lid)
+        else:
+            alphas[lid] = alpha
+    return (combine_tiles(alphas) if alphas else None), empty
+
+
+async def fetch_layer(session, semaphore, layer_name, z, x, y, cache=None):
+    """Fetch one layer's tile, going through the --cache-dir cache if open.
+
+    Only successful responses are cached, so failed tiles are retried on
+    the next run.
+    """
+    key = (layer_name, z, x, y)
+    if cache is not None:
+        data = await cache.get(key)
+        if data is not None:
+            return data
+    data = await fetch_tile(session, wms_url(layer_name, z, x, y), semaphore)
+    if cache is not None and data:
+        await cache.put(key, data)
+    return data
+
+
+async def process_tile(session, semaphore, pool, z, x, y, greedy=False, cache=None):
+    """Fetch all layers for one tile and combine.
+
+    Decoding and combining run in `pool` (a ProcessPoolExecutor) so they
+    overlap the event loop's network I/O; responses already known to be
+    empty are dropped by digest without decoding. With greedy, layers are
+    fetched one at a time in priority order and the rest are skipped once
+    GREEDY_COVERAGE of the tile is claimed, so lower-priority classes may be
+    dropped from the last few pixels.
+    """
+    loop = asyncio.get_running_loop()
+    if greedy:
+        alphas = {}
+        covered = np.zeros((TILE_SIZE, TILE_SIZE), bool)
+        for layer in LAYERS_BY_PRIORITY:
+            data = await fetch_layer(session, semaphore, layer["wms_layer"], z, x, y, cache)
+            if not data:
+                continue
+            digest = tile_digest(data)
+            if _known_empty(digest):
+                continue
+            alpha = _layer_alpha(data)
+            hit = None if alpha is None else alpha > ALPHA_THRESHOLD
+            if hit is None or not hit.any():
+                _remember_empty(digest)
+                continue
+            alphas[layer["id"]] = alpha
+            covered |= hit
+            if covered.mean() > GREEDY_COVERAGE:
+                break
+        if not alphas:
+            return None
+        return await loop.run_in_executor(pool, combine_tiles, alphas)
+
     tasks = {}
     for layer in LAYERS:
-        url = wms_url(layer["wms_layer"], z, x, y)
-        tasks[layer["id"]] = fetch_tile(session, url, semaphore)
+        tasks[layer["id"]] = fetch_layer(
+            session, semaphore, layer["wms_layer"], z, x, y, cache
+        )
 
     results = await asyncio.gather(*tasks.values())
-    layer_images = {}
+    # Ship the compressed bodies, not decoded arrays, across the process boundary
+    responses = {}
+    digests = {}
     for lid, data in zip(tasks.keys(), results):
         if data:
-            try:
-                layer_images[lid] = Image.open(io.BytesIO(data)).convert("RGBA")
-            except Exception:
-                pass
-
-    if not layer_images:
+            digests[lid] = tile_digest(data)
+            if not _known_empty(digests[lid]):
+                responses[lid] = data
+    if not responses:
         return None
 
-    return combine_tiles(layer_images)
+    png, empty = await loop.run_in_executor(pool, combine_responses, responses)
+    for lid in empty:
+        _remember_empty(digests[lid])
+    return png
 
 
-async def generate(min_zoom, max_zoom, output_path, concurrency=8):
-    """Main generation loop."""
+async def generate(min_zoom, max_zoom, output_path, concurrency=8, greedy=False,
+                   cache_dir=None, coverage=None, coverage_out=None):
+    """Main generation loop.
+
+    `coverage` is a load_coverage bitmap; tiles outside it are skipped
+    without a request. `coverage_out` writes one from this run's tiles.
+    """
     db = init_mbtiles(output_path)
+    cache = TileCache(cache_dir) if cache_dir else None
     semaphore = asyncio.Semaphore(concurrency)
-    connector = aiohttp.TCPConnector(limit=concurrency * 2)
+    # Every request goes to one host: keep its connections and DNS answer
+    # alive across the whole run instead of re-handshaking
+    connector = aiohttp.TCPConnector(
+        limit=concurrency * 4, limit_per_host=concurrency * 4,
+        ttl_dns_cache=600, keepalive_timeout=75,
+    )
 
     total_tiles = sum(4 ** z for z in range(min_zoom, max_zoom + 1))
     saved = 0
     skipped = 0
     t0 = time.time()
-
-    async with aiohttp.ClientSession(connector=connector) as session:
-        for z in range(min_zoom, max_zoom + 1):
-            n = 2 ** z
-            level_total = n * n
-            level_done = 0
-            print(f"\n--- Zoom {z}: {level_total} tiles ({level_total * 4} WMS requests) ---")
-
-            # Process in batches to avoid memory issues
-            batch_size = min(64, n * n)
-            batch = []
-
-            for y in range(n):
-                for x in range(n):
-                    batch.append((z, x, y))
-
-                    if len(batch) >= batch_size:
+    queue = asyncio.Queue(maxsize=8)
+    writer = asyncio.create_task(tile_writer(db, queue))
+
+    try:
+        with ProcessPoolExecutor() as pool:
+            async with aiohttp.ClientSession(connector=connector) as session:
+                for z in range(min_zoom, max_zoom + 1):
+                    n = 2 ** z
+                    level_total = n * n
+                    level_done = 0
+                    print(f"\n--- Zoom {z}: {level_total} tiles ({level_total * 4} WMS requests) ---")
+
+                    batch_size = 64
+                    if coverage is None:
+                        coords = [(x, y) for y in range(n) for x in range(n)]
+                    else:
+                        ys, xs = np.nonzero(coverage_level(coverage, z))
+                        coords = list(zip(xs.tolist(), ys.tolist()))
+                        masked = level_total - len(coords)
+                        skipped += masked
+                        level_done += masked
+                        print(f"  {masked} tiles outside coverage")
+
+                    for i in range(0, len(coords), batch_size):
+                        batch = coords[i:i + batch_size]
                         results = await asyncio.gather(
-                            *[process_tile(session, semaphore, bz, bx, by)
-                              for bz, bx, by in batch]
+                            *[process_tile(session, semaphore, pool, z, x, y, greedy, cache)
+                              for x, y in batch]
                         )
-                        for (bz, bx, by), png_data in zip(batch, results):
+                        rows = []
+                        for (x, y), png_data in zip(batch, results):
                             if png_data:
-                                tms_y = flip_y(bz, by)
-                                db.execute(
-                                    "INSERT OR REPLACE INTO tiles VALUES (?,?,?,?)",
-                                    (bz, bx, tms_y, png_data),
-                                )
+                                rows.append((z, x, flip_y(z, y), png_data))
                                 saved += 1
                             else:
                                 skipped += 1
-                            level_done += 1
+                        level_done += len(batch)
+                        if rows:
+                            await queue.put(rows)
+                        if cache is not None:
+                            await cache.commit()
 
                         elapsed = time.time() - t0
                         rate = (saved + skipped) / max(elapsed, 0.1)
@@ -234,38 +615,40 @@ async def generate(min_zoom, max_zoom, output_path, concurrency=8):
                             f"{rate:.1f} tiles/s",
                             end="\r",
                         )
-                        batch = []
-                        db.commit()
-
-            # Final batch
-            if batch:
-                results = await asyncio.gather(
-                    *[process_tile(session, semaphore, bz, bx, by)
-                      for bz, bx, by in batch]
-                )
-                for (bz, bx, by), png_data in zip(batch, results):
-                    if png_data:
-                        tms_y = flip_y(bz, by)
-                        db.execute(
-                            "INSERT OR REPLACE INTO tiles VALUES (?,?,?,?)",
-                            (bz, bx, tms_y, png_data),
-                        )
-                        saved += 1
-                    else:
-                        skipped += 1
-                db.commit()
 
-            print(f"\n  z{z} complete: {saved} tiles saved, {skipped} skipped")
-
-    # Update metadata with actual zoom range
-    db.execute(
-        "INSERT OR REPLACE INTO metadata VALUES ('minzoom', ?)", (str(min_zoom),)
-    )
-    db.execute(
-        "INSERT OR REPLACE INTO metadata VALUES ('maxzoom', ?)", (str(max_zoom),)
-    )
-    db.commit()
-    db.close()
+                    print(f"\n  z{z} complete: {saved} tiles saved, {skipped} skipped")
+
+        await queue.put(None)
+        await writer
+
+        # Index the bulk-loaded rows in one pass, then record the zoom range
+        db.execute("BEGIN")
+        db.execute(
+            "CREATE UNIQUE INDEX tile_index ON tiles "
+            "(zoom_level, tile_column, tile_row)"
+        )
+        db.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('minzoom', ?)", (str(min_zoom),)
+        )
+        db.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('maxzoom', ?)", (str(max_zoom),)
+        )
+        db.commit()
+        if coverage_out:
+            if max_zoom < COVERAGE_ZOOM:
+                print(f"\nNot writing {coverage_out}: needs --max-zoom >= {COVERAGE_ZOOM}")
+            else:
+                covered = write_coverage(db, coverage_out)
+                print(f"\nCoverage: {covered} z{COVERAGE_ZOOM} tiles written to {coverage_out}")
+    finally:
+        # On failure, still flush the queued rows and the cache so a
+        # re-run with --cache-dir picks up where this one stopped
+        if not writer.done():
+            await queue.put(None)
+            await asyncio.gather(writer, return_exceptions=True)
+        if cache is not None:
+            cache.close()
+        db.close()
 
     elapsed = time.time() - t0
     print(f"\nDone in {elapsed:.0f}s. {saved} tiles saved to {output_path}")
@@ -282,13 +665,29 @@ def main():
                         help="Max zoom level (default 6, ~2.5km/pixel)")
     parser.add_argument("--output", default="worldcereal_croptype_2021.mbtiles")
     parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--greedy", action="store_true",
+                        help="Fetch layers in priority order and skip the rest "
+                             "once a tile is 99%% covered (fewer WMS requests)")
+    parser.add_argument("--cache-dir",
+                        help="Keep raw WMS responses in an SQLite cache here "
+                             "so re-runs skip the download")
+    parser.add_argument("--coverage",
+                        help=f"Bit-packed z{COVERAGE_ZOOM} tile bitmap; tiles outside "
+                             "it are skipped without a WMS request")
+    parser.add_argument("--write-coverage", metavar="PATH",
+                        help=f"Write a z{COVERAGE_ZOOM} coverage bitmap from this "
+                             f"run's tiles (needs --max-zoom >= {COVERAGE_ZOOM})")
     args = parser.parse_args()
 
     print(f"Generating WorldCereal combined crop type map z{args.min_zoom}-{args.max_zoom}")
     print(f"Layers: {', '.join(l['id'] for l in LAYERS)}")
     print(f"Output: {args.output}")
 
-    asyncio.run(generate(args.min_zoom, args.max_zoom, args.output, args.concurrency))
+    coverage = load_coverage(args.coverage) if args.coverage else None
+
+    run = uvloop.run if uvloop is not None else asyncio.run
+    run(generate(args.min_zoom, args.max_zoom, args.output, args.concurrency,
+                 args.greedy, args.cache_dir, coverage, args.write_coverage))
 
 
 if __name__ == "__main__":